@@ -1,15 +1,9 @@
 import streamlit as st
-import cv2
-import numpy as np
 import sys
-try:
-    from src.motion_tracker import MotionTracker
-except ImportError:
-    MotionTracker = None
-except Exception as e:
-    st.error(f"Error importing MotionTracker: {e}")
-    MotionTracker = None
-
+import json
+import time
+import threading
+from collections import OrderedDict, deque
 try:
     from src.ai_engine import AIEngine
 except ImportError:
@@ -25,81 +19,195 @@ st.set_page_config(page_title="FitAI Coach", layout="wide")
 # Debug Info
 st.sidebar.write(f"Python Version: {sys.version.split()[0]}")
 
-# Initialize Classes
-if 'tracker' not in st.session_state:
-    if MotionTracker:
-        try:
-            st.session_state.tracker = MotionTracker()
-        except Exception as e:
-            st.error(f"Failed to initialize MotionTracker: {e}")
-            st.session_state.tracker = None
-    else:
-        st.session_state.tracker = None
+@st.cache_resource(show_spinner=False)
+def _import_motion_tracker():
+    """
+    Imports the camera stack on first use only (MediaPipe alone takes 1-2 s to import),
+    so the Planner and Chat pages start without it. Returns (MotionTracker, error).
+    """
+    try:
+        from src.motion_tracker import MotionTracker
+        return MotionTracker, None
+    except ImportError:
+        return None, None
+    except Exception as e:
+        return None, e
 
+# Shared, expensive resources: built once per process instead of once per session
+@st.cache_resource
+def get_ai_engine():
+    return AIEngine.create()
+
+# Initialize Classes
 if 'ai_engine' not in st.session_state:
     if AIEngine:
         try:
-            st.session_state.ai_engine = AIEngine()
+            st.session_state.ai_engine = get_ai_engine()
         except Exception as e:
             st.error(f"Failed to initialize AIEngine: {e}")
             st.session_state.ai_engine = None
     else:
         st.session_state.ai_engine = None
 
+class _TTLCache:
+    """Small thread-safe LRU with expiry, shared by all sessions (see _plan_cache)."""
+
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict() # key -> (stored_at, value), oldest first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if time.monotonic() - item[0] > self.ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+# Cached AI calls: identical inputs return instantly instead of re-hitting the API
+@st.cache_resource
+def _plan_cache() -> _TTLCache:
+    # Plans are streamed, so finished texts are stored here keyed by the stats JSON
+    # (bounded, and expiring after an hour like the original cache_data(ttl=3600))
+    return _TTLCache(maxsize=256, ttl=3600)
+
+def _to_tracker_config(params: dict) -> dict:
+    """Converts AI exercise parameters to the MotionTracker config format."""
+    # Tracker expects: landmarks (list), thresholds (up/down dict)
+    # AI returns: landmarks, thresholds (min/max), mode
+    
+    tracker_config = {
+        "description": params.get("description", "Custom AI Exercise"),
+        "landmarks": params.get("landmarks", []),
+        "thresholds": {},
+        "mode": params.get("mode", "max_min")
+    }
+    
+    # AI returns: min (low) and max (high)
+    # Tracker uses: down (contraction point) and up (extension point/start)
+    
+    ai_min = params["thresholds"].get("min", 30)
+    ai_max = params["thresholds"].get("max", 150)
+    
+    # Add margin/buffer to make reps easier to register
+    # We want to trigger when user passes these thresholds inwards
+    buffer = 15 
+    
+    # Apply buffer:
+    # Down threshold (lower bound) -> increased by buffer (easier to go below)
+    # Up threshold (upper bound) -> decreased by buffer (easier to go above)
+    tracker_config["thresholds"]["down"] = ai_min + buffer
+    tracker_config["thresholds"]["up"] = ai_max - buffer
+    
+    # Debug output to help user understand the range
+    st.info(f"AI Parameters: {ai_min}° - {ai_max}°. Tracking set to: <{tracker_config['thresholds']['down']}° and >{tracker_config['thresholds']['up']}°.")
+    return tracker_config
+
+def _show_analysis(placeholder, wait=False):
+    """Renders the pending background set analysis once it has finished."""
+    future = st.session_state.get('pending_analysis')
+    if future is None or not (wait or future.done()):
+        return
+    analysis = future.result()
+    st.session_state.pending_analysis = None
+    st.session_state.last_analysis = analysis
+    with placeholder.container():
+        st.success("Analysis Complete!")
+        st.markdown(analysis)
+
+def _show_window_feedback(placeholder, always=False):
+    """
+    Shows the newest finished live-window analysis (requested while a set is recorded).
+    always=False only redraws when a new result has arrived.
+    """
+    slot = st.session_state.get('window_analysis')
+    arrived = bool(slot) and slot[0].done()
+    if arrived:
+        st.session_state.window_feedback = slot.pop().result()
+    if (arrived or always) and st.session_state.get('window_feedback'):
+        placeholder.info(f"Live feedback:\n\n{st.session_state.window_feedback}")
+
 st.title("🏋️ FitAI: Your AI Fitness Coach")
 
 # Sidebar for Navigation
 page = st.sidebar.selectbox("Choose Mode", ["Motion Analysis", "AI Planner", "Chat"])
 
+# Release the camera when leaving the Motion Analysis page
+if page != "Motion Analysis" and st.session_state.get('pose_worker') is not None:
+    st.session_state.pose_worker.stop()
+    st.session_state.pose_worker = None
+
 if page == "Motion Analysis":
+    # Camera-only dependencies are imported here, not at the top of the script
+    import cv2
+    from src.camera import FrameGrabber, PoseWorker, paste_rec_indicator
+    try:
+        from streamlit_webrtc import webrtc_streamer
+        from src.webrtc_processor import PoseVideoProcessor
+    except ImportError:
+        webrtc_streamer = None
+    MotionTracker, import_error = _import_motion_tracker()
+    if import_error:
+        st.error(f"Error importing MotionTracker: {import_error}")
+
+    # Initialize Tracker
+    if 'tracker' not in st.session_state:
+        if MotionTracker:
+            try:
+                # Rep counter / recording state stays per session; the Pose graph is process-wide
+                st.session_state.tracker = MotionTracker()
+            except Exception as e:
+                st.error(f"Failed to initialize MotionTracker: {e}")
+                st.session_state.tracker = None
+        else:
+            st.session_state.tracker = None
+
+    # Live feedback while recording: each full window of samples becomes one background
+    # set-analysis request (called from the inference thread, so only touch the slot here)
+    if 'window_analysis' not in st.session_state:
+        st.session_state.window_analysis = deque(maxlen=1)
+    if st.session_state.tracker and st.session_state.ai_engine:
+        engine, window_slot = st.session_state.ai_engine, st.session_state.window_analysis
+        st.session_state.tracker.window_callback = lambda window: window_slot.append(engine.submit(engine.aanalyze_recorded_set(window)))
+
     st.header("Real-Time Motion Analysis")
     
     # Custom Exercise Adder
     with st.expander("➕ Add New Exercise Logic (AI Powered)"):
-        new_exercise_name = st.text_input("Enter Exercise Name (e.g., 'Lateral Raise')")
+        new_exercise_name = st.text_input("Enter Exercise Name(s), comma separated (e.g., 'Lateral Raise, Lunge')")
         if st.button("Generate & Add"):
-            if new_exercise_name and st.session_state.ai_engine:
-                with st.spinner(f"Consulting AI Kinesiologist about {new_exercise_name}..."):
-                    params = st.session_state.ai_engine.get_exercise_parameters(new_exercise_name)
-                    if params and st.session_state.tracker:
-                        # Convert AI params to Tracker format
-                        # Tracker expects: landmarks (list), thresholds (up/down dict)
-                        # AI returns: landmarks, thresholds (min/max), mode
-                        
-                        tracker_config = {
-                            "description": params.get("description", "Custom AI Exercise"),
-                            "landmarks": params.get("landmarks", []),
-                            "thresholds": {},
-                            "mode": params.get("mode", "max_min")
-                        }
-                        
-                        # AI returns: min (low) and max (high)
-                        # Tracker uses: down (contraction point) and up (extension point/start)
-                        
-                        ai_min = params["thresholds"].get("min", 30)
-                        ai_max = params["thresholds"].get("max", 150)
-                        
-                        # Add margin/buffer to make reps easier to register
-                        # We want to trigger when user passes these thresholds inwards
-                        buffer = 15 
-                        
-                        # Apply buffer:
-                        # Down threshold (lower bound) -> increased by buffer (easier to go below)
-                        # Up threshold (upper bound) -> decreased by buffer (easier to go above)
-                        tracker_config["thresholds"]["down"] = ai_min + buffer
-                        tracker_config["thresholds"]["up"] = ai_max - buffer
-                        
-                        # Debug output to help user understand the range
-                        st.info(f"AI Parameters: {ai_min}° - {ai_max}°. Tracking set to: <{tracker_config['thresholds']['down']}° and >{tracker_config['thresholds']['up']}°.")
-                        
-                        st.session_state.tracker.add_custom_exercise(
-                            new_exercise_name, 
-                            config=tracker_config
-                        )
-                        st.success(f"Added {new_exercise_name}!")
+            names = [n.strip() for n in new_exercise_name.split(",") if n.strip()]
+            if names and st.session_state.ai_engine:
+                with st.spinner(f"Consulting AI Kinesiologist about {', '.join(names)}..."):
+                    # One request for all names; the engine answers known exercises from its cache
+                    all_params = st.session_state.ai_engine.get_exercise_parameters_batch(names)
+
+                    added = False
+                    for name, params in all_params.items():
+                        if params and st.session_state.tracker:
+                            tracker_config = _to_tracker_config(params)
+                            st.session_state.tracker.add_custom_exercise(
+                                name, 
+                                config=tracker_config
+                            )
+                            st.success(f"Added {name}!")
+                            added = True
+                        else:
+                            st.error(f"Failed to get parameters for {name}.")
+                    if added:
                         st.rerun() 
-                    else:
-                        st.error("Failed to get parameters.")
     
     # Exercise Selector
     # Get all available exercises from tracker
@@ -127,21 +235,64 @@ if page == "Motion Analysis":
         
         st.write(f"Enable your camera to start tracking {exercise_choice}.")
         
+        # Browser camera via WebRTC when available: capture + inference run on
+        # streamlit-webrtc's worker thread and survive widget reruns
+        sources = ["Browser (WebRTC)", "Local Camera"] if webrtc_streamer else ["Local Camera"]
+        use_webrtc = st.radio("Camera Source", sources, horizontal=True) == "Browser (WebRTC)"
+        
         col1, col2 = st.columns(2)
-        run = col1.checkbox('Start Camera', value=False)
+        run = False if use_webrtc else col1.checkbox('Start Camera', value=False)
         record = col2.checkbox('Record Set (Check to start, Uncheck to stop & analyze)', value=False)
         
-        FRAME_WINDOW = st.image([])
+        MAX_REPS_PER_SESSION = 50
+
+        if use_webrtc:
+            tracker = st.session_state.tracker
+            ctx = webrtc_streamer(
+                key="fitai",
+                video_processor_factory=lambda: PoseVideoProcessor(tracker),
+                media_stream_constraints={"video": {"width": 640, "height": 480, "frameRate": 30}, "audio": False},
+                async_processing=True
+            )
+            if ctx.video_processor:
+                ctx.video_processor.record = record
+
+            # Poll the processor for metrics without blocking the script
+            @st.fragment(run_every=0.2)
+            def live_metrics():
+                data = ctx.video_processor.get_latest_data() if ctx.video_processor else None
+                if data is None:
+                    return
+                kpi1, kpi2, kpi3 = st.columns(3)
+                kpi1.metric("Reps", data['reps'])
+                kpi2.metric("Stage", data['state'])
+                kpi3.metric("Feedback", data.get('feedback', ''))
+                _show_window_feedback(st.empty(), always=True)
+                if data['reps'] >= MAX_REPS_PER_SESSION:
+                    st.error(f"Session limit reached ({MAX_REPS_PER_SESSION} reps) to save API credits.")
+
+            live_metrics()
+        else:
+            FRAME_WINDOW = st.image([])
         
-        camera = cv2.VideoCapture(0)
+        # Keep one capture/inference worker per session so reruns don't reopen the device
+        if run and st.session_state.get('pose_worker') is None:
+            grabber = FrameGrabber(0, width=640, height=480, fps=30)
+            st.session_state.pose_worker = PoseWorker(st.session_state.tracker, grabber)
+        elif not run and st.session_state.get('pose_worker') is not None:
+            st.session_state.pose_worker.stop()
+            st.session_state.pose_worker = None
         
         # Create placeholders for metrics to prevent memory leak/FPS drop
-        kpi1, kpi2, kpi3 = st.columns(3)
-        reps_display = kpi1.empty()
-        state_display = kpi2.empty()
-        feedback_display = kpi3.empty()
+        if not use_webrtc:
+            kpi1, kpi2, kpi3 = st.columns(3)
+            reps_display = kpi1.empty()
+            state_display = kpi2.empty()
+            feedback_display = kpi3.empty()
         
         analysis_placeholder = st.empty()
+        window_placeholder = st.empty()
+        _show_window_feedback(window_placeholder, always=True)
 
         # Display previous analysis if available
         if "last_analysis" in st.session_state and st.session_state.last_analysis:
@@ -157,6 +308,7 @@ if page == "Motion Analysis":
              if not st.session_state.was_recording:
                  if st.session_state.tracker:
                      st.session_state.tracker.start_recording()
+                 st.session_state.window_feedback = None # Live feedback belongs to the current set
                  st.session_state.was_recording = True
         else:
              if st.session_state.was_recording:
@@ -165,51 +317,78 @@ if page == "Motion Analysis":
                      reps = st.session_state.tracker.counter
                      st.session_state.was_recording = False
                      
-                     # Trigger Analysis
+                     # Trigger Analysis in the background so the camera loop keeps running
                      if st.session_state.ai_engine:
-                         with analysis_placeholder.container():
-                             st.info(f"Analyzing set of {reps} reps...")
-                             analysis = st.session_state.ai_engine.analyze_recorded_set(result)
-                             st.success("Analysis Complete!")
-                             st.markdown(analysis)
-                             st.session_state.last_analysis = analysis 
+                         engine = st.session_state.ai_engine
+                         st.session_state.pending_analysis = engine.submit(engine.aanalyze_recorded_set(result))
+                         st.session_state.pending_reps = reps
 
+        if st.session_state.get('pending_analysis') is not None:
+            reps = st.session_state.get('pending_reps', 0)
+            if run:
+                # Polled from the camera loop below
+                analysis_placeholder.info(f"Analyzing set of {reps} reps...")
+            else:
+                # Without a running camera loop to poll the result, just wait for it
+                with st.spinner(f"Analyzing set of {reps} reps..."):
+                    _show_analysis(analysis_placeholder, wait=True)
 
-
-
-        MAX_REPS_PER_SESSION = 50
-
+        worker = st.session_state.get('pose_worker')
+        if worker:
+            # Pose inference on every other frame is enough for live counting;
+            # use every frame while recording so the analysis data is complete
+            worker.grabber.stride = 1 if record else 2
+        
+        # Last values pushed to the metric widgets
+        last_metrics = (None, None, None)
+        last_update_ts = 0.0
+        
         while run:
-            _, frame = camera.read()
-            if frame is None:
-                st.warning("Camera not detected.")
-                break
+            # Frames are captured and processed on the worker thread
+            item = worker.get(timeout=0.1)
+            if item is None:
+                if worker.error is not None:
+                    st.error(f"Motion tracking stopped: {worker.error}")
+                    worker.stop()
+                    st.session_state.pose_worker = None
+                    break
+                if not worker.grabber.is_opened():
+                    st.warning("Camera not detected.")
+                    break
+                continue
                 
-            # Process Frame
-            frame, data = st.session_state.tracker.process_frame(frame)
+            frame, data = item
+            _show_analysis(analysis_placeholder)
+            _show_window_feedback(window_placeholder)
             counter = data['reps']
             state = data['state']
             feedback = data.get('feedback', '')
             
-            # Update Metrics
-            reps_display.metric("Reps", counter)
-            state_display.metric("Stage", state)
-            feedback_display.metric("Feedback", feedback)
+            # Update Metrics only when something changed, at most every 100 ms
+            now = time.monotonic()
+            if (counter, state, feedback) != last_metrics and now - last_update_ts > 0.1:
+                if counter != last_metrics[0]:
+                    reps_display.metric("Reps", counter)
+                if state != last_metrics[1]:
+                    state_display.metric("Stage", state)
+                if feedback != last_metrics[2]:
+                    feedback_display.metric("Feedback", feedback)
+                last_metrics = (counter, state, feedback)
+                last_update_ts = now
             
-            # Recording Status Indicator
+            # Recording Status Indicator (pre-rendered tile, pasted into the top-left corner)
             if record:
-                cv2.circle(frame, (30, 30), 20, (0, 0, 255), -1) 
-                cv2.putText(frame, "REC", (60, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                paste_rec_indicator(frame)
             
             if counter >= MAX_REPS_PER_SESSION:
                 st.error(f"Session limit reached ({MAX_REPS_PER_SESSION} reps) to save API credits.")
                 break
 
-            # Display Output
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            FRAME_WINDOW.image(frame)
-        
-        camera.release()
+            # Display Output: JPEG-encode the BGR frame ourselves instead of letting
+            # Streamlit PNG-encode a raw array (faster encode, much smaller payload)
+            ok, buf = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 75])
+            if ok:
+                FRAME_WINDOW.image(buf.tobytes())
 
 
 elif page == "AI Planner":
@@ -233,9 +412,17 @@ elif page == "AI Planner":
                     "goal": goal,
                     "activity_level": activity
                 }
-                with st.spinner("Generating your plan..."):
-                    plan = st.session_state.ai_engine.generate_plan(stats)
-                    st.markdown(plan)
+                stats_key = json.dumps(stats, sort_keys=True)
+                plan_cache = _plan_cache()
+                cached_plan = plan_cache.get(stats_key)
+                if cached_plan is not None:
+                    st.markdown(cached_plan)
+                else:
+                    # Stream tokens as they arrive instead of waiting for the full plan
+                    stream = st.session_state.ai_engine.generate_plan_stream(stats)
+                    plan = st.write_stream(stream)
+                    if stream.completed: # Not a failed or cut-off reply
+                        plan_cache.put(stats_key, plan)
 
 elif page == "Chat":
     st.header("💬 Chat with Coach FitAI")
@@ -263,12 +450,11 @@ elif page == "Chat":
 
             # Display assistant response in chat message container
             with st.chat_message("assistant", avatar="💪"):
-                with st.spinner("Coach AI is thinking..."):
-                    # Pass history excluding the latest user message which is passed strictly as the first arg in current implementation of get_chat_response would take care of appending it?
-                    # Actually get_chat_response takes (user_message, chat_history). 
-                    # If I pass chat_history as messages[:-1], then it appends user_message, so it matches.
-                    response = st.session_state.ai_engine.get_chat_response(prompt, st.session_state.messages[:-1])
-                    st.markdown(response)
+                # Pass history excluding the latest user message which is passed strictly as the first arg in current implementation of get_chat_response would take care of appending it?
+                # Actually get_chat_response takes (user_message, chat_history). 
+                # If I pass chat_history as messages[:-1], then it appends user_message, so it matches.
+                # Render tokens as they arrive
+                response = st.write_stream(st.session_state.ai_engine.get_chat_response_stream(prompt, st.session_state.messages[:-1]))
             
             # Add assistant response to chat history
             st.session_state.messages.append({"role": "assistant", "content": response})
@@ -1,9 +1,25 @@
 import json
+import re
 
 class FitAI:
     def __init__(self):
         self.role = "Expert AI Fitness Coach and Kinesiologist"
 
+        # Error keyword -> fix dispatch table, compiled once.
+        # Each alternative is a lookahead from the start of the string, so the
+        # first matching rule wins (same priority as an if/elif chain).
+        self._fix_re = re.compile(
+            r"^(?:(?=.*(?P<knees>knees caving))"
+            r"|(?=.*(?P<depth>depth))"
+            r"|(?=.*(?P<backr>back.*round|round.*back)))",
+            re.I | re.S
+        )
+        self._fixes = {
+            "knees": "Push knees outward.",
+            "depth": "Squat deeper.",
+            "backr": "Chest up, back straight."
+        }
+
     def process_input(self, input_data):
         """
         Distinguishes between Motion Data (JSON) and User Chat (String).
@@ -24,21 +40,15 @@ class FitAI:
         response_parts = [f"Exercise: {exercise}."]
 
         # Calculate score (Simple heuristic: 10 - 2 points per error)
-        score = max(0, 10 - (len(errors) * 2))
+        score = max(0, 10 - (len(errors) << 1))
 
         if errors:
             # Explain fixes
             fixes = []
             for error in errors:
-                error_lower = error.lower()
-                if "knees caving" in error_lower:
-                    fixes.append("Push knees outward.")
-                elif "depth" in error_lower:
-                    fixes.append("Squat deeper.")
-                elif "back" in error_lower and "round" in error_lower:
-                    fixes.append("Chest up, back straight.")
-                else:
-                    fixes.append(f"Fix: {error}.")
+                m = self._fix_re.match(error)
+                fix = self._fixes.get(m.lastgroup) if m else None
+                fixes.append(fix or f"Fix: {error}.")
             
             response_parts.append(" ".join(fixes))
         else:
@@ -48,9 +58,10 @@ class FitAI:
         
         final_response = " ".join(response_parts)
         
-        # Ensure under 50 words
-        if len(final_response.split()) > 50:
-             final_response = " ".join(final_response.split()[:50]) + "..."
+        # Ensure under 50 words (split once, join only when truncating)
+        words = final_response.split()
+        if len(words) > 50:
+            final_response = " ".join(words[:50]) + "..."
              
         return final_response
 
@@ -0,0 +1,103 @@
+import math
+import numpy as np
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Per-frame rep counting / form checks compiled to native code with Numba.
+# Without Numba the same functions run as plain Python, so results are identical.
+# Landmarks come in as a (33, 2) float64 array of x, y in MediaPipe Pose order;
+# stages and feedback messages are passed as small int codes (see below).
+
+HAVE_NUMBA = njit is not None
+if not HAVE_NUMBA:
+    def njit(*args, **kwargs):
+        # Bare @njit or @njit(...) both become a no-op
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda f: f
+
+# Stage codes <-> MotionTracker.stage values
+STAGE_NONE, STAGE_UP, STAGE_DOWN = 0, 1, 2
+STAGES = (None, "UP", "DOWN")
+STAGE_CODES = {None: STAGE_NONE, "UP": STAGE_UP, "DOWN": STAGE_DOWN}
+
+# Feedback codes -> messages shown in the HUD
+SQUAT_FEEDBACK = ("Good Form", "Keep Chest Up", "Go Lower")
+
+# MediaPipe PoseLandmark indices
+LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE, LEFT_ANKLE = 11, 23, 25, 27
+
+# The ten tracked joints as (proximal, axis, distal) landmark triplets,
+# in the row order of joint_angles()
+JOINTS = {
+    "LEFT_ELBOW": 0, "RIGHT_ELBOW": 1, "LEFT_SHOULDER": 2, "RIGHT_SHOULDER": 3, "LEFT_HIP": 4,
+    "RIGHT_HIP": 5, "LEFT_KNEE": 6, "RIGHT_KNEE": 7, "LEFT_ANKLE": 8, "RIGHT_ANKLE": 9,
+}
+JOINT_TRIPLETS = np.array([
+    (11, 13, 15), (12, 14, 16), # Shoulder - elbow - wrist
+    (23, 11, 13), (24, 12, 14), # Hip - shoulder - elbow
+    (11, 23, 25), (12, 24, 26), # Shoulder - hip - knee
+    (23, 25, 27), (24, 26, 28), # Hip - knee - ankle
+    (25, 27, 31), (26, 28, 32), # Knee - ankle - foot index
+], dtype=np.intp)
+PROX_IDX, AXIS_IDX, DIST_IDX = JOINT_TRIPLETS.T.copy()
+
+
+@njit(cache=True, fastmath=True)
+def angle_at(lm, a, b, c):
+    """Angle in degrees (0-180) at landmark b between landmarks a and c of lm; used by all per-frame analyzers."""
+    radians = (math.atan2(lm[c, 1] - lm[b, 1], lm[c, 0] - lm[b, 0])
+               - math.atan2(lm[a, 1] - lm[b, 1], lm[a, 0] - lm[b, 0]))
+    # Fold (180, 360] onto [0, 180) without a branch
+    return 180.0 - abs(abs(radians * 180.0 / math.pi) - 180.0)
+
+
+@njit(cache=True, fastmath=True)
+def squat_kernel(lm, stage, counter, thresh_up, thresh_down):
+    """Returns (knee_angle, stage, counter, feedback_code) for one frame."""
+    angle = angle_at(lm, LEFT_HIP, LEFT_KNEE, LEFT_ANKLE)
+    hip_angle = angle_at(lm, LEFT_KNEE, LEFT_HIP, LEFT_SHOULDER) # Torso lean
+
+    if angle > thresh_up:
+        stage = STAGE_UP
+    elif angle < thresh_down and stage == STAGE_UP:
+        stage = STAGE_DOWN
+        counter += 1
+
+    feedback = 0
+    if hip_angle < 70: # Torso leaning too forward
+        feedback = 1
+    if stage == STAGE_DOWN and angle > 100: # Not deep enough when trying to go down
+        feedback = 2
+    return angle, stage, counter, feedback
+
+
+@njit(cache=True, fastmath=True)
+def _angles(lm, prox_idx, axis_idx, dist_idx):
+    """angle_at for each (prox_idx[i], axis_idx[i], dist_idx[i]) triplet."""
+    out = np.empty(prox_idx.size)
+    for i in range(prox_idx.size):
+        out[i] = angle_at(lm, prox_idx[i], axis_idx[i], dist_idx[i])
+    return out
+
+
+def joint_angles(lm):
+    """Angles in degrees (0-180) of all JOINTS for one frame."""
+    if HAVE_NUMBA:
+        return _angles(lm, PROX_IDX, AXIS_IDX, DIST_IDX)
+    # Plain Python: one vectorized NumPy pass beats looping over the joints
+    b = lm[AXIS_IDX]
+    ba = lm[PROX_IDX] - b
+    bc = lm[DIST_IDX] - b
+    angle = np.abs(np.degrees(np.arctan2(bc[:, 1], bc[:, 0]) - np.arctan2(ba[:, 1], ba[:, 0])))
+    return 180.0 - np.abs(angle - 180.0)
+
+
+def warmup():
+    """Compiles the kernels ahead of the first camera frame (no-op without Numba)."""
+    lm = np.zeros((33, 2), np.float64) # Same dtype as MotionTracker's pts
+    angle_at(lm, LEFT_HIP, LEFT_KNEE, LEFT_ANKLE)
+    squat_kernel(lm, STAGE_NONE, 0, 160.0, 90.0)
+    joint_angles(lm)
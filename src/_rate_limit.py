@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Client-side throttling in the style of the OpenAI cookbook's
+# api_request_parallel_processor: requests wait for capacity *before* they are
+# sent, instead of being rejected with a 429 and retried.
+
+_ENCODINGS = {}
+
+def estimate_tokens(messages, model="gpt-4o-mini"):
+    """Rough prompt size of a chat request (tiktoken if installed, else ~4 chars/token)."""
+    text = "".join(str(m.get("content", "")) for m in messages)
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    if model not in _ENCODINGS:
+        try:
+            _ENCODINGS[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _ENCODINGS[model] = tiktoken.get_encoding("o200k_base")
+    return len(_ENCODINGS[model].encode(text))
+
+
+class TokenBucket:
+    """
+    Requests-per-minute and tokens-per-minute budget shared by every call site.
+    Capacity refills continuously; acquire() blocks until enough is available.
+    Safe to use from threads (acquire) and from the event loop (aacquire).
+    """
+
+    def __init__(self, rpm=500, tpm=200_000):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.available_request_capacity = float(rpm)
+        self.available_token_capacity = float(tpm)
+        self.last_update = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _try_take(self, tokens):
+        """Takes capacity if possible; otherwise returns the seconds to wait."""
+        tokens = min(tokens, self.tpm) # A single oversized request must still go through eventually
+        with self.lock:
+            now = time.monotonic()
+            elapsed = now - self.last_update
+            self.last_update = now
+            self.available_request_capacity = min(self.rpm, self.available_request_capacity + self.rpm * elapsed / 60.0)
+            self.available_token_capacity = min(self.tpm, self.available_token_capacity + self.tpm * elapsed / 60.0)
+
+            if self.available_request_capacity >= 1 and self.available_token_capacity >= tokens:
+                self.available_request_capacity -= 1
+                self.available_token_capacity -= tokens
+                return 0.0
+
+            request_wait = max(0.0, 1 - self.available_request_capacity) * 60.0 / self.rpm
+            token_wait = max(0.0, tokens - self.available_token_capacity) * 60.0 / self.tpm
+            return max(request_wait, token_wait, 0.001)
+
+    def acquire(self, tokens):
+        while True:
+            wait = self._try_take(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def aacquire(self, tokens):
+        while True:
+            wait = self._try_take(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
@@ -1,14 +1,192 @@
 import os
-from openai import OpenAI, RateLimitError
+import atexit
+import asyncio
+import shelve
+import functools
+import threading
+import warnings
+import httpx
+import numpy as np
+import orjson
+from openai import OpenAI, AsyncOpenAI, RateLimitError, APIConnectionError, APITimeoutError
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
 from dotenv import load_dotenv
+from ._rate_limit import TokenBucket, estimate_tokens
 
 load_dotenv()
 
+# Background event loop for concurrent / fire-and-forget API calls.
+# HTTP waits release the GIL, so several requests overlap their network latency.
+_LOOP = None
+_LOOP_LOCK = threading.Lock()
+
+def _get_loop():
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_LOOP.run_forever, daemon=True).start()
+    return _LOOP
+
+# Process-wide OpenAI clients, one per API key, so every AIEngine instance shares
+# the same keep-alive HTTP/2 connection pool instead of paying a new TLS handshake
+# (SDK-level retries are off: _chat/_achat retry with jittered backoff instead)
+_CLIENTS = {}
+_ASYNC_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+def _get_client(api_key: str) -> OpenAI:
+    with _CLIENTS_LOCK:
+        if api_key not in _CLIENTS:
+            client = OpenAI(api_key=api_key, max_retries=0, http_client=httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+                timeout=httpx.Timeout(30.0, connect=5.0)
+            ))
+            atexit.register(client.close)
+            _CLIENTS[api_key] = client
+        return _CLIENTS[api_key]
+
+def _get_async_client(api_key: str) -> AsyncOpenAI:
+    # Only ever used on the background loop above.
+    # Sized for many overlapping requests (form, set analysis, chat at the same time).
+    with _CLIENTS_LOCK:
+        if api_key not in _ASYNC_CLIENTS:
+            client = AsyncOpenAI(api_key=api_key, max_retries=0, http_client=httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+                timeout=httpx.Timeout(30.0, connect=5.0)
+            ))
+            atexit.register(_close_async_client, client)
+            _ASYNC_CLIENTS[api_key] = client
+        return _ASYNC_CLIENTS[api_key]
+
+def _close_async_client(client: AsyncOpenAI):
+    # Drain pooled connections on the loop that owns them
+    if _LOOP is not None and _LOOP.is_running():
+        try:
+            asyncio.run_coroutine_threadsafe(client.close(), _LOOP).result(timeout=2)
+        except Exception:
+            pass
+
+def _is_quota_error(e) -> bool:
+    """True for the 429 sent when the account is out of credit (retrying can't help)."""
+    code = getattr(e, "code", None)
+    if code is None and isinstance(getattr(e, "body", None), dict):
+        error = e.body.get("error", e.body)
+        code = error.get("code") if isinstance(error, dict) else None
+    return code == "insufficient_quota"
+
+# Transient failures (429s, dropped connections, timeouts) are retried with jittered
+# exponential backoff; the last error is re-raised so callers keep their error messages.
+# An exhausted quota is also a 429 but not transient, so it fails right away
+_RETRY = retry(
+    wait=wait_random_exponential(min=1, max=60),
+    stop=stop_after_attempt(6),
+    retry=retry_if_exception(lambda e: isinstance(e, (RateLimitError, APIConnectionError, APITimeoutError))
+                             and not _is_quota_error(e)),
+    reraise=True
+)
+
+# One request/token budget for the whole process (form, set analysis, plans, chat),
+# so bursts are delayed client-side instead of turning into 429 retries
+_BUCKET = TokenBucket(
+    rpm=int(os.getenv("FITAI_OPENAI_RPM", "500")),
+    tpm=int(os.getenv("FITAI_OPENAI_TPM", "200000"))
+)
+
+# Exercise parameters are (near-)deterministic per name, so they are kept on disk
+# across runs: lru_cache in front of a shelve file, then the API on a miss.
+# Bump _EXERCISE_CACHE_VERSION when the parameter format changes to ignore old records.
+_EXERCISE_CACHE_PATH = os.path.expanduser(os.path.join("~", ".coachai", "exercise_cache"))
+_EXERCISE_CACHE_VERSION = 2
+_EXERCISE_CACHE_LOCK = threading.Lock()
+
+def _exercise_key(exercise_name: str) -> str:
+    return exercise_name.lower().strip()
+
+@functools.lru_cache(maxsize=256)
+def _read_exercise_cache(key: str):
+    # Returns the stored params as JSON bytes, so each caller decodes its own copy
+    try:
+        with _EXERCISE_CACHE_LOCK, shelve.open(_EXERCISE_CACHE_PATH, flag='r') as db:
+            record = db.get(key)
+    except Exception:
+        return None # No cache file yet (or unreadable)
+    if not record or record.get("v") != _EXERCISE_CACHE_VERSION:
+        return None
+    return orjson.dumps(record["params"])
+
+def _load_cached_exercise(exercise_name: str):
+    cached = _read_exercise_cache(_exercise_key(exercise_name))
+    return orjson.loads(cached) if cached else None
+
+def _store_cached_exercise(exercise_name: str, params: dict):
+    try:
+        os.makedirs(os.path.dirname(_EXERCISE_CACHE_PATH), exist_ok=True)
+        with _EXERCISE_CACHE_LOCK, shelve.open(_EXERCISE_CACHE_PATH) as db:
+            db[_exercise_key(exercise_name)] = {"v": _EXERCISE_CACHE_VERSION, "params": params}
+    except Exception as e:
+        print(f"Could not write exercise cache: {e}")
+        return
+    _read_exercise_cache.cache_clear() # Drop remembered misses
+
+def _valid_exercise_params(params) -> bool:
+    return (
+        isinstance(params, dict)
+        and isinstance(params.get("landmarks"), list) and len(params["landmarks"]) == 3
+        and isinstance(params.get("thresholds"), dict)
+    )
+
+class ReplyStream:
+    """
+    Reply text chunks from the streaming methods, for st.write_stream.
+    Errors are yielded as a single message, so callers can render the stream as-is;
+    since that message may follow text already streamed, check .completed before
+    keeping the result (e.g. in a cache).
+    """
+
+    def __init__(self, chunks, error_prefix: str = "Error", error: str = None):
+        self._chunks = chunks
+        self._error_prefix = error_prefix
+        self._error = error # Fixed error message instead of a reply (see message())
+        self.completed = False # True once the whole reply arrived without an error
+
+    @classmethod
+    def message(cls, text: str):
+        """A stream that only yields an error/notice text and never completes."""
+        return cls(iter(()), error=text)
+
+    def __iter__(self):
+        if self._error is not None:
+            yield self._error
+            return
+        try:
+            for chunk in self._chunks:
+                yield chunk
+        except RateLimitError:
+            yield "Error: OpenAI API Quota Exceeded. Please check your billing details at platform.openai.com."
+        except Exception as e:
+            yield f"{self._error_prefix}: {str(e)}"
+        else:
+            self.completed = True
+
 class AIEngine:
+    @classmethod
+    def create(cls):
+        """
+        Returns an AIEngine, or a _NullEngine with the same interface when no
+        API key is configured (so callers never need to check for a client).
+        """
+        return cls() if os.getenv("OPENAI_API_KEY") else _NullEngine()
+
     def __init__(self):
         # API Key (Loaded from environment)
         api_key = os.getenv("OPENAI_API_KEY")
-        self.client = OpenAI(api_key=api_key) if api_key else None
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY is not set. Use AIEngine.create() to fall back gracefully.")
+        self.client = _get_client(api_key)
+        self.aclient = _get_async_client(api_key)
         
         # Load the custom coach instructions
         try:
@@ -16,129 +194,225 @@ class AIEngine:
                 self.chat_prompt = f.read()
         except FileNotFoundError:
             self.chat_prompt = "You are FitAI, a concise and professional fitness coach."
-            
-        self.system_prompt = "You are FitAI, a strict biomechanics coach. Receive JSON data about exercise. Provide detailed form correction feedback."
 
-    def get_exercise_parameters(self, exercise_name: str) -> dict:
+    def submit(self, coro):
         """
-        Asks the AI for the biomechanical parameters to track a new exercise.
-        Returns a JSON dict with:
-        - key_landmarks: [list of 3 pose landmarks to form an angle, e.g. ['LEFT_SHOULDER', 'LEFT_ELBOW', 'LEFT_WRIST']]
-        - thresholds: {'down': angle, 'up': angle} - indicating the range of motion
-        - description: "Short description"
+        Schedules a coroutine (e.g. aanalyze_recorded_set) on the background loop.
+        Returns a concurrent.futures.Future so callers can keep working and poll it.
         """
-        if not self.client:
-            return None
+        return asyncio.run_coroutine_threadsafe(coro, _get_loop())
 
+    def _run(self, coro):
+        """Runs a coroutine on the background loop and waits for its result."""
+        return self.submit(coro).result()
+
+    @_RETRY
+    def _chat(self, model, messages, **kw):
+        _BUCKET.acquire(estimate_tokens(messages, model) + kw.get("max_tokens", 0))
+        return self.client.chat.completions.create(model=model, messages=messages, **kw)
+
+    @_RETRY
+    async def _achat(self, model, messages, **kw):
+        await _BUCKET.aacquire(estimate_tokens(messages, model) + kw.get("max_tokens", 0))
+        return await self.aclient.chat.completions.create(model=model, messages=messages, **kw)
+
+    def _exercise_messages(self, exercise_names: list) -> list:
+        # One prompt for any number of exercises: the instructions are sent once
+        names = ", ".join(f"'{n}'" for n in exercise_names)
         prompt = f"""
-        Provide the biomechanical tracking parameters for the exercise: '{exercise_name}'.
-        Return ONLY valid JSON. No markdown.
+        Provide the biomechanical tracking parameters for these exercises: {names}.
+        Return ONLY a valid JSON object mapping each exercise name, exactly as given, to its parameters. No markdown.
         Format:
         {{
-            "landmarks": ["point_A", "point_B", "point_C"],
-            "thresholds": {{"min": number, "max": number}},
-            "mode": "min_max" or "max_min", 
-            "description": "Short description of the movement."
+            "<exercise name>": {{
+                "landmarks": ["point_A", "point_B", "point_C"],
+                "thresholds": {{"min": number, "max": number}},
+                "mode": "min_max" or "max_min", 
+                "description": "Short description of the movement."
+            }}
         }}
         - landmarks must be 3 specific MediaPipe Pose Landmarks keys (e.g. LEFT_HIP, LEFT_KNEE, LEFT_ANKLE) that best define the repetition.
         - thresholds defines the angle values at the extremes of the movement.
         - mode 'min_max' means start low, go high to count (like lateral raise), 'max_min' means start high, go low (like squat).
         """
-        
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a computer vision expert. You output strictly JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=200,
-                temperature=0.1
-            )
-            content = response.choices[0].message.content.strip()
-            # Clean possible markdown code blocks
-            if content.startswith("```"):
-                content = content.replace("```json", "").replace("```", "")
-            
-            import json
-            return json.loads(content)
-        except Exception as e:
-            print(f"Error getting parameters: {e}")
-            return None
+        return [
+            {"role": "system", "content": "You are a computer vision expert. You output strictly JSON."},
+            {"role": "user", "content": prompt}
+        ]
 
-    def analyze_form(self, motion_data: dict) -> str:
+    @staticmethod
+    def _parse_json(content: str):
+        content = content.strip()
+        # Clean possible markdown code blocks
+        if content.startswith("```"):
+            content = content.replace("```json", "").replace("```", "")
+        return orjson.loads(content)
+
+    def get_exercise_parameters(self, exercise_name: str) -> dict:
+        """
+        Asks the AI for the biomechanical parameters to track a new exercise.
+        Returns a JSON dict with:
+        - key_landmarks: [list of 3 pose landmarks to form an angle, e.g. ['LEFT_SHOULDER', 'LEFT_ELBOW', 'LEFT_WRIST']]
+        - thresholds: {'down': angle, 'up': angle} - indicating the range of motion
+        - description: "Short description"
+        """
+        return self._run(self.aget_exercise_parameters(exercise_name))
+
+    async def aget_exercise_parameters(self, exercise_name: str) -> dict:
+        """Async variant of get_exercise_parameters."""
+        return (await self.aget_exercise_parameters_batch([exercise_name]))[exercise_name]
+
+    def get_exercise_parameters_batch(self, exercise_names: list) -> dict:
         """
-        Analyzes motion data using GPT-4o-mini.
+        Looks up several exercises with a single request (cached names are not sent).
+        Returns {exercise_name: params or None}.
         """
-        if not self.client:
-            return "Error: OpenAI API Key not found."
+        return self._run(self.aget_exercise_parameters_batch(exercise_names))
 
+    async def aget_exercise_parameters_batch(self, exercise_names: list) -> dict:
+        """Async variant of get_exercise_parameters_batch."""
+        results = {name: _load_cached_exercise(name) for name in exercise_names}
+        pending = [name for name, params in results.items() if params is None]
+        if not pending:
+            return results
         try:
-            response = self.client.chat.completions.create(
+            response = await self._achat(
                 model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": str(motion_data)}
-                ],
-                max_tokens=100
+                messages=self._exercise_messages(pending),
+                max_tokens=200 * len(pending),
+                temperature=0.1,
+                response_format={"type": "json_object"}
             )
-            return response.choices[0].message.content
-        except RateLimitError:
-            return "Error: OpenAI API Quota Exceeded. Please check your billing details at platform.openai.com."
+            reply = self._parse_json(response.choices[0].message.content)
+            by_key = {_exercise_key(str(k)): v for k, v in reply.items()}
         except Exception as e:
-            return f"Error analyzing form: {str(e)}"
+            print(f"Error getting parameters: {e}")
+            return results
 
-    def analyze_recorded_set(self, data: dict) -> str:
+        missing = {_exercise_key(n) for n in pending} - set(by_key)
+        if missing:
+            print(f"No parameters returned for: {', '.join(sorted(missing))}")
+        for name in pending:
+            params = by_key.get(_exercise_key(name))
+            if _valid_exercise_params(params):
+                _store_cached_exercise(name, params)
+                results[name] = params
+        return results
+
+    def analyze_form(self, motion_data: dict) -> str:
         """
-        Analyzes a full set of recorded motion data.
+        Deprecated: per-frame requests are dominated by network overhead.
+        Routes the frame through analyze_recorded_set as a one-sample set.
         """
-        if not self.client:
-            return "Error: OpenAI API Key not found."
+        warnings.warn("analyze_form is deprecated; use analyze_recorded_set on a window of frames", DeprecationWarning, stacklevel=2)
+        return self._run(self.aanalyze_recorded_set(self._single_frame_set(motion_data)))
+
+    async def aanalyze_form(self, motion_data: dict) -> str:
+        """Deprecated async variant of analyze_form."""
+        warnings.warn("aanalyze_form is deprecated; use aanalyze_recorded_set on a window of frames", DeprecationWarning, stacklevel=2)
+        return await self.aanalyze_recorded_set(self._single_frame_set(motion_data))
 
-        system_msg = "You are a strict Strength Coach. Output ONLY the Form Score, 3 specific cues, and a weight recommendation."
+    @staticmethod
+    def _single_frame_set(motion_data: dict) -> dict:
+        return {"exercise_name": motion_data.get("exercise_name", "Exercise"), "frames": [motion_data]}
+
+    def _recorded_set_messages(self, data: dict) -> list:
+        system_msg = "You are a strict Strength Coach. Reply with ONLY a JSON object."
         
+        # One request for the whole set: per-rep feedback comes back in the same reply.
+        # Frames go out as CSV rows (no repeated keys/brackets: far fewer prompt tokens)
+        rows = self._frames_csv(data.get('frames', []))
         prompt = f"""
         Analyze this set of {data.get('exercise_name', 'Exercise')}.
-        Data: {str(data.get('frames', []))}
-        Keys: i=frame_index, a=angle, s=stage, l=landmarks(x,y).
-        
-        REQUIRED OUTPUT FORMAT (No other text):
-        Form Score: [0-10]/10
-        Cues for Improvement:
-        - [Cue 1]
-        - [Cue 2]
-        - [Cue 3]
+        Data (CSV, one row per sampled frame): i,a,s,x0,y0,x1,y1,...,x32,y32
+        {rows}
+        Columns: i=frame_index, a=angle, s=stage (- if none), then the 33 MediaPipe Pose landmarks as x,y pairs.
         
-        Recommendation:
-        - If Score < 7: "Your form is breaking down. Lower the weight immediately to prevent injury."
-        - If Score >= 7: "Good weight management. Focus on controlling the eccentric phase."
+        REQUIRED OUTPUT (JSON, no other text):
+        {{
+            "score": 0-10,
+            "cues": ["Cue 1", "Cue 2", "Cue 3"],
+            "reps": [{{"rep_index": 1, "feedback": "short cue", "score": 0-10}}]
+        }}
         """
+        return [
+            {"role": "system", "content": system_msg},
+            {"role": "user", "content": prompt}
+        ]
 
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_msg},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=300
+    @staticmethod
+    def _frames_csv(frames) -> str:
+        """CSV rows for the recorded frames: columnar (MotionTracker.stop_recording) or a list of frame dicts."""
+        if isinstance(frames, dict):
+            l = np.asarray(frames['l'], np.float64)
+            # Explicit row width: reshape(n, -1) is ambiguous for an empty recording
+            coords = np.round(l.reshape(len(l), int(np.prod(l.shape[1:]))), 3).tolist()
+            return "\n".join(
+                f"{i},{a},{s or '-'},{','.join(map(str, xy))}"
+                for i, a, s, xy in zip(np.asarray(frames['i']).tolist(), np.asarray(frames['a']).tolist(), frames['s'], coords)
             )
-            return response.choices[0].message.content
-        except RateLimitError:
+        return "\n".join(
+            f"{f.get('i', '')},{f.get('a', '')},{f.get('s') or '-'},{','.join(map(str, f.get('l', [])))}"
+            if 'l' in f else orjson.dumps(f, option=orjson.OPT_SERIALIZE_NUMPY).decode() # Not a recorder sample: compact JSON
+            for f in frames
+        )
+
+    @staticmethod
+    def _format_set_report(content: str) -> str:
+        """Renders the JSON set analysis as the markdown report shown in the app."""
+        try:
+            report = orjson.loads(content)
+            score = int(report.get("score", 0))
+        except (orjson.JSONDecodeError, TypeError, ValueError, AttributeError):
+            return content # Not JSON - show the model output as-is
+
+        lines = [f"Form Score: {score}/10", "", "Cues for Improvement:"]
+        lines += [f"- {cue}" for cue in report.get("cues", [])]
+        lines += ["", "Recommendation:"]
+        if score < 7:
+            lines.append("- Your form is breaking down. Lower the weight immediately to prevent injury.")
+        else:
+            lines.append("- Good weight management. Focus on controlling the eccentric phase.")
+
+        reps = report.get("reps", [])
+        if reps:
+            lines += ["", "Per-Rep Feedback:"]
+            lines += [f"- Rep {r.get('rep_index', i + 1)} ({r.get('score', '?')}/10): {r.get('feedback', '')}" for i, r in enumerate(reps)]
+        return "\n".join(lines)
+
+    @staticmethod
+    def _recorded_set_error(e: Exception) -> str:
+        if isinstance(e, RateLimitError):
             return "Error: Quota Exceeded."
-        except Exception as e:
-            # Fallback for Context Length Error - try to truncate
-            if "context_length_exceeded" in str(e):
-                return "Error: Recording too long. Please try a shorter set (max 10-15 reps)."
-            return f"Error analyzing set: {str(e)}"
+        # Fallback for Context Length Error - try to truncate
+        if "context_length_exceeded" in str(e):
+            return "Error: Recording too long. Please try a shorter set (max ~30 reps)."
+        return f"Error analyzing set: {str(e)}"
 
-    def generate_plan(self, user_stats: dict) -> str:
+    def analyze_recorded_set(self, data: dict) -> str:
         """
-        Generates a workout/nutrition plan based on user stats.
+        Analyzes a full set of recorded motion data.
         """
-        if not self.client:
-            return "Error: OpenAI API Key not found. Please check your .env file."
+        return self._run(self.aanalyze_recorded_set(data))
 
+    async def aanalyze_recorded_set(self, data: dict) -> str:
+        """Async variant of analyze_recorded_set, e.g. for engine.submit() after a set."""
+        frames = data.get('frames', [])
+        if not len(frames['i'] if isinstance(frames, dict) else frames):
+            # Stopped before the first sampled frame (every 10th): nothing to send
+            return "Error: No frames recorded. Please record for at least a few seconds."
+        try:
+            response = await self._achat(
+                model="gpt-4o-mini",
+                messages=self._recorded_set_messages(data),
+                max_tokens=450,
+                response_format={"type": "json_object"}
+            )
+            return self._format_set_report(response.choices[0].message.content)
+        except Exception as e:
+            return self._recorded_set_error(e)
+
+    def _plan_messages(self, user_stats: dict) -> list:
         prompt = f"""
         You are FitAI, an expert fitness coach. Create a concise plan for a user with these stats:
         - Weight: {user_stats.get('weight')} kg
@@ -153,15 +427,38 @@ class AIEngine:
         
         Keep it under 150 words. Use bullet points.
         """
+        return [
+            {"role": "system", "content": "You are a helpful fitness assistant."},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _stream(self, messages: list, error_prefix: str = "Error", **kw) -> ReplyStream:
+        """The reply text as it arrives (first tokens in a few hundred ms), see ReplyStream."""
+        def chunks():
+            # Streams are consumed on the caller's thread, so they use the sync client
+            for chunk in self._chat(model="gpt-4o-mini", messages=messages, stream=True, **kw):
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content or ""
+        return ReplyStream(chunks(), error_prefix)
+
+    def generate_plan(self, user_stats: dict) -> str:
+        """
+        Generates a workout/nutrition plan based on user stats.
+        """
+        return self._run(self.agenerate_plan(user_stats))
+
+    def generate_plan_stream(self, user_stats: dict):
+        """Streaming variant of generate_plan: yields text chunks (see _stream)."""
+        return self._stream(self._plan_messages(user_stats), "Error generating plan", max_tokens=220, temperature=0.4)
 
+    async def agenerate_plan(self, user_stats: dict) -> str:
+        """Async variant of generate_plan (non-streaming)."""
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a helpful fitness assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=300
+            response = await self._achat(
+                model="gpt-4o-mini",
+                messages=self._plan_messages(user_stats),
+                max_tokens=220, # ~150 words
+                temperature=0.4
             )
             return response.choices[0].message.content
         except RateLimitError:
@@ -169,13 +466,7 @@ class AIEngine:
         except Exception as e:
             return f"Error generating plan: {str(e)}"
 
-    def get_chat_response(self, user_message: str, chat_history: list = None) -> str:
-        """
-        Handles general chat queries with context.
-        """
-        if not self.client:
-             return "Error: OpenAI API Key not found."
-
+    def _chat_messages(self, user_message: str, chat_history: list = None) -> list:
         # Use the loaded chat prompt as the system message
         messages = [{"role": "system", "content": self.chat_prompt}]
         
@@ -183,15 +474,80 @@ class AIEngine:
             messages.extend(chat_history)
         
         messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def get_chat_response(self, user_message: str, chat_history: list = None) -> str:
+        """
+        Handles general chat queries with context.
+        """
+        return self._run(self.aget_chat_response(user_message, chat_history))
+
+    def get_chat_response_stream(self, user_message: str, chat_history: list = None):
+        """Streaming variant of get_chat_response: yields text chunks (see _stream)."""
+        return self._stream(self._chat_messages(user_message, chat_history), max_tokens=180, temperature=0.4)
 
+    async def aget_chat_response(self, user_message: str, chat_history: list = None) -> str:
+        """Async variant of get_chat_response (non-streaming)."""
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                max_tokens=150
+            response = await self._achat(
+                model="gpt-4o-mini",
+                messages=self._chat_messages(user_message, chat_history),
+                max_tokens=180,
+                temperature=0.4
             )
             return response.choices[0].message.content
         except RateLimitError:
             return "Error: OpenAI API Quota Exceeded. Please check your billing details at platform.openai.com."
         except Exception as e:
             return f"Error: {str(e)}"
+
+
+class _NullEngine:
+    """Stand-in for AIEngine when no OpenAI API key is configured."""
+
+    MESSAGE = "Error: OpenAI key not configured. Please check your .env file."
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+    def get_exercise_parameters(self, exercise_name: str) -> dict:
+        return None
+
+    async def aget_exercise_parameters(self, exercise_name: str) -> dict:
+        return None
+
+    def get_exercise_parameters_batch(self, exercise_names: list) -> dict:
+        return {name: None for name in exercise_names}
+
+    async def aget_exercise_parameters_batch(self, exercise_names: list) -> dict:
+        return {name: None for name in exercise_names}
+
+    def analyze_form(self, motion_data: dict) -> str:
+        return self.MESSAGE
+
+    async def aanalyze_form(self, motion_data: dict) -> str:
+        return self.MESSAGE
+
+    def analyze_recorded_set(self, data: dict) -> str:
+        return self.MESSAGE
+
+    async def aanalyze_recorded_set(self, data: dict) -> str:
+        return self.MESSAGE
+
+    def generate_plan(self, user_stats: dict) -> str:
+        return self.MESSAGE
+
+    def generate_plan_stream(self, user_stats: dict):
+        return ReplyStream.message(self.MESSAGE)
+
+    async def agenerate_plan(self, user_stats: dict) -> str:
+        return self.MESSAGE
+
+    def get_chat_response(self, user_message: str, chat_history: list = None) -> str:
+        return self.MESSAGE
+
+    def get_chat_response_stream(self, user_message: str, chat_history: list = None):
+        return ReplyStream.message(self.MESSAGE)
+
+    async def aget_chat_response(self, user_message: str, chat_history: list = None) -> str:
+        return self.MESSAGE
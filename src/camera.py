@@ -0,0 +1,142 @@
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+
+
+class FrameGrabber:
+    """
+    Reads frames from a camera on a background thread.
+    Only the most recent frame is kept, so callers never block on the driver
+    and never process a stale, buffered frame.
+    """
+
+    def __init__(self, src=0, width=640, height=480, fps=30):
+        self.cap = cv2.VideoCapture(src)
+        # Keep the driver queue as short as possible
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        # MJPG at 640x480 keeps USB bandwidth and per-frame pixel work low
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.cap.set(cv2.CAP_PROP_FPS, fps)
+
+        self.latest = None
+        self.lock = threading.Lock()
+        self.running = True
+        # Only every `stride`-th grabbed frame is decoded and handed out
+        self.stride = 1
+        self.frame_idx = 0
+
+        self.thread = threading.Thread(target=self._update, daemon=True)
+        self.thread.start()
+
+    def _update(self):
+        while self.running:
+            if not self.cap.grab():
+                time.sleep(0.01) # Avoid spinning when the device is unavailable
+                continue
+            self.frame_idx += 1
+            if self.frame_idx % self.stride != 0:
+                continue # grab() advanced the stream; skip the decode
+            ok, frame = self.cap.retrieve()
+            if not ok:
+                continue
+            with self.lock:
+                self.latest = frame
+
+    def is_opened(self):
+        return self.cap.isOpened()
+
+    def read_latest(self):
+        """
+        Takes the newest frame out of the slot.
+        Returns None if no new frame has arrived since the last call.
+        """
+        with self.lock:
+            frame, self.latest = self.latest, None
+        return frame
+
+    def stop(self):
+        """Stops the capture thread and releases the camera."""
+        self.running = False
+        self.thread.join(timeout=1.0)
+        self.cap.release()
+
+
+class PoseWorker:
+    """
+    Runs capture + pose inference on a background thread.
+    The newest annotated frame is published to a size-1 queue, so the UI thread
+    can render while the next frame is being inferred. Stale frames are dropped.
+    If processing raises, the worker stops and keeps the exception in `error`.
+    """
+
+    def __init__(self, tracker, grabber):
+        self.tracker = tracker
+        self.grabber = grabber
+        self.queue = queue.Queue(maxsize=1)
+        self.stop_event = threading.Event()
+        self.error = None
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            frame = self.grabber.read_latest()
+            if frame is None:
+                time.sleep(0.005) # Wait for the next frame from the grabber thread
+                continue
+
+            try:
+                annotated, data = self.tracker.process_frame(frame)
+            except Exception as e:
+                # Surfaced by the UI loop (see error) instead of a silently frozen feed
+                print(f"Pose worker stopped: {e}")
+                self.error = e
+                self.stop_event.set()
+                break
+
+            # Replace any frame the UI has not picked up yet
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.queue.put((annotated, data))
+
+    def get(self, timeout=0.1):
+        """Returns the newest (frame, data) pair, or None if nothing arrived in time."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        """Stops the worker and releases the camera."""
+        self.stop_event.set()
+        self.thread.join(timeout=1.0)
+        self.grabber.stop()
+
+
+_REC_TILE = None
+_REC_MASK = None
+
+def paste_rec_indicator(frame):
+    """
+    Pastes the "REC" indicator into the top-left corner of a BGR frame.
+    The tile is rendered once; each call is a single masked copy instead of
+    rasterising the circle and text again.
+    """
+    global _REC_TILE, _REC_MASK
+    if _REC_TILE is None:
+        tile = np.zeros((60, 140, 3), np.uint8)
+        # Hard-edged (LINE_8) so the non-zero pixels form an exact paste mask
+        cv2.circle(tile, (30, 30), 20, (0, 0, 255), -1, cv2.LINE_8)
+        cv2.putText(tile, "REC", (60, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_8)
+        _REC_MASK = tile.any(axis=2, keepdims=True)
+        _REC_TILE = tile
+    roi = frame[:_REC_TILE.shape[0], :_REC_TILE.shape[1]]
+    np.copyto(roi, _REC_TILE, where=_REC_MASK)
+    return frame
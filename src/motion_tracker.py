@@ -1,18 +1,70 @@
+import os
+import queue
+import threading
+import weakref
 import cv2
 try:
     import mediapipe as mp
 except ImportError:
     mp = None
 import numpy as np
-from .utils import calculate_angle
+from . import _pose_kernel
+from .pose_backends import OnnxPose, TasksPose, DEFAULT_ONNX_MODEL, tasks_model_path
+
+HUD_COLOR = (245, 117, 16) # BGR
+
+# Process-wide pool of pose graphs for MotionTrackers that aren't given their own.
+# Video-mode graphs carry tracking and smoothing state from frame to frame, so a
+# graph serves one tracker (one stream) at a time: acquire_pose checks one out, and
+# it goes back to the pool when the tracker is closed or garbage collected. A new
+# session/tab then reuses an idle graph after pose.reset(): Solutions Pose clears its
+# state in place and ONNX has none, so neither reloads the model; the Tasks
+# PoseLandmarker has no reset and is recreated from its options (a model reload).
+_POSE_POOL = {} # (model_complexity, min_detection_confidence, min_tracking_confidence) -> [(pose, lock), ...]
+_POSE_POOL_LOCK = threading.Lock()
+
+def acquire_pose(model_complexity=0, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+    """Returns (key, pose, lock): an idle pooled pose graph with this configuration, or a new one."""
+    key = (model_complexity, min_detection_confidence, min_tracking_confidence)
+    with _POSE_POOL_LOCK:
+        idle = _POSE_POOL.get(key)
+        entry = idle.pop() if idle else None
+    if entry is None:
+        return key, MotionTracker.build_pose(model_complexity=model_complexity,
+                                             min_detection_confidence=min_detection_confidence,
+                                             min_tracking_confidence=min_tracking_confidence), threading.Lock()
+    pose, lock = entry
+    pose.reset() # Forget the previous stream's tracking state
+    return key, pose, lock
+
+def release_pose(key, pose, lock):
+    """Puts a graph from acquire_pose back into the pool."""
+    with _POSE_POOL_LOCK:
+        _POSE_POOL.setdefault(key, []).append((pose, lock))
 
 class MotionTracker:
-    def __init__(self):
+    def __init__(self, pose=None, pose_lock=None, model_complexity=0,
+                 min_detection_confidence=0.5, min_tracking_confidence=0.5):
+        """
+        pose / pose_lock: a dedicated pose estimator (see build_pose) and its lock.
+        By default a graph is taken from the process-wide pool (see acquire_pose).
+        model_complexity: 0 (lite, fastest - default for live coaching), 1 (full) or 2 (heavy);
+        trades FPS for landmark accuracy. Ignored when pose is given, like the confidences.
+        """
         if mp is None:
             raise ImportError("MediaPipe not installed")
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+        self._release_pose = None
+        if pose is None:
+            key, pose, pose_lock = acquire_pose(model_complexity, min_detection_confidence, min_tracking_confidence)
+            # Returns the graph to the pool on close() or when the tracker is collected
+            self._release_pose = weakref.finalize(self, release_pose, key, pose, pose_lock)
+        self.pose = pose
+        self.pose_lock = pose_lock if pose_lock is not None else threading.Lock()
+        # Frames may be processed on a camera/WebRTC thread while the UI thread switches
+        # exercises or starts/stops recording: both take this lock
+        self.state_lock = threading.RLock()
         self.counter = 0
         self.stage = None
         self.feedback = "Ready"
@@ -20,8 +72,75 @@ class MotionTracker:
         
         # Audio / Recording vars
         self.recording = False
-        self.recorded_data = []
         self.frame_count = 0
+        self._reset_recording()
+
+        # Live feedback during a set: every window_size recorded samples,
+        # window_callback(data) is called with the same dict shape as stop_recording()
+        # (e.g. to schedule one analyze_recorded_set request for that window)
+        self.window_size = 30
+        self.window_callback = None
+
+        # PoseLandmark indices as plain ints (enum attribute chains are slow per frame)
+        lm = self.mp_pose.PoseLandmark
+        self.L_HIP = lm.LEFT_HIP.value
+        self.L_KNEE = lm.LEFT_KNEE.value
+        self.L_ANKLE = lm.LEFT_ANKLE.value
+        self.L_SHOULDER = lm.LEFT_SHOULDER.value
+        self.L_ELBOW = lm.LEFT_ELBOW.value
+        self.L_WRIST = lm.LEFT_WRIST.value
+
+        # HUD tiles (see process_frame): the static "REPS"/"STAGE" box is rasterized once
+        self._hud_base = np.empty((74, 226, 3), np.uint8)
+        self._hud_base[:] = HUD_COLOR
+        cv2.putText(self._hud_base, 'REPS', (15,12), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,0), 1, cv2.LINE_AA)
+        cv2.putText(self._hud_base, 'STAGE', (65,12), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,0), 1, cv2.LINE_AA)
+        self._hud, self._hud_key = None, None
+        self._bar, self._bar_text = None, None
+
+        # Live-view inference skipping (see _detect). motion_threshold is the summed
+        # |dx| + |dy| of all landmarks between two detections (normalized coordinates)
+        self.interpolate = True
+        self.motion_threshold = 0.5
+        self._prev_landmarks = None
+        self._last_landmarks = None
+        self._skip_next = False
+        # Pose inference runs on every detect_every-th live frame; the frames in
+        # between reuse the last detection (1 = detect on every frame)
+        self.detect_every = 2
+        self._frame_idx = 0
+        self._last_results = None
+        self._last_pts = None
+        # Motion-based reuse: the last detection is also kept while a 32x32 grayscale
+        # thumbnail of the frame differs from the one last inferred by less than
+        # reuse_threshold (mean absolute gray level), up to revalidate_every frames
+        self.reuse_threshold = 3.0
+        self.revalidate_every = 15
+        self._prev_small = None
+        self._since_detect = 0
+        self._inferred = 0
+
+        # Compile the native per-frame kernels now rather than on the first camera frame
+        _pose_kernel.warmup()
+
+        # Reused downscale and RGB input buffers for MediaPipe (avoid per-frame allocations)
+        self._resize_buf = None
+        self._rgb_buf = None
+        # Frames are downscaled to this short side (pixels) for inference only; the
+        # landmarks are normalized, so drawing still happens on the full frame.
+        # None = infer at the native resolution
+        self.inference_size = 256
+
+        # Opt-in background inference for the live view (see _detect_async): frames are
+        # handed to a worker thread and the newest finished result is shown meanwhile.
+        # Results more than max_result_lag frames (~0.5 s at 30 fps) old are dropped as stale
+        self.async_inference = False
+        self.max_result_lag = 15
+        self._infer_in_q = queue.Queue(maxsize=1)
+        self._infer_out_q = queue.Queue(maxsize=1)
+        self._infer_thread = None
 
         # Good form definitions
         self.good_forms = {
@@ -38,118 +157,198 @@ class MotionTracker:
                 "thresholds": {"down": 90, "up": 160}
             }
         }
+
+        # Skeleton bones as (start, end) landmark index pairs (see _draw_pose)
+        self._edges = np.array(sorted(self.mp_pose.POSE_CONNECTIONS), dtype=np.intp)
+
+        # Angles of all tracked joints for the current frame (see _pose_kernel.JOINTS)
+        self.joint_angles = None
+
+        # Per-frame analyzer for current_exercise (see _compile_exercise)
+        self._analyzer = self._compile_exercise(self.current_exercise)
     
+    @staticmethod
+    def build_pose(backend=None, model_complexity=0, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+        """
+        Creates the pose estimator (expensive: loads the model).
+        model_complexity picks the lite/full/heavy model (Solutions Pose and Tasks).
+        backend: 'tasks' (MediaPipe PoseLandmarker, GPU delegate when available),
+        'onnx' (MoveNet on ONNX Runtime, GPU when available) or 'mediapipe' (Solutions Pose, CPU).
+        Defaults to the FITAI_POSE_BACKEND env var, else to 'tasks' when its .task model file
+        is present and 'mediapipe' otherwise; the model file path comes from FITAI_POSE_MODEL.
+        Falls back to Solutions Pose if the chosen backend can't be created.
+        """
+        if mp is None:
+            raise ImportError("MediaPipe not installed")
+        tasks_model = os.getenv("FITAI_POSE_MODEL", tasks_model_path(model_complexity))
+        # The .task models aren't bundled: without one, Solutions Pose is the default
+        default = "tasks" if os.path.exists(tasks_model) else "mediapipe"
+        backend = (backend or os.getenv("FITAI_POSE_BACKEND", default)).lower()
+        if backend == "tasks":
+            try:
+                return TasksPose(tasks_model,
+                                 min_detection_confidence=min_detection_confidence,
+                                 min_tracking_confidence=min_tracking_confidence)
+            except Exception as e:
+                print(f"Tasks pose backend unavailable, falling back to MediaPipe Solutions: {e}")
+        elif backend == "onnx":
+            try:
+                return OnnxPose(os.getenv("FITAI_POSE_MODEL", DEFAULT_ONNX_MODEL))
+            except Exception as e:
+                print(f"ONNX pose backend unavailable, falling back to MediaPipe: {e}")
+        # Video mode (static_image_mode=False) so landmarks are tracked between frames;
+        # segmentation is unused, so it stays off
+        def solutions_pose(complexity):
+            return mp.solutions.pose.Pose(
+                model_complexity=complexity,
+                smooth_landmarks=True,
+                enable_segmentation=False,
+                min_detection_confidence=min_detection_confidence,
+                min_tracking_confidence=min_tracking_confidence
+            )
+        try:
+            return solutions_pose(model_complexity)
+        except Exception as e:
+            # The mediapipe wheel only ships the full (1) model; lite/heavy are downloaded
+            # into site-packages on first use, which fails offline or on a read-only install
+            if model_complexity == 1:
+                raise
+            print(f"Pose model_complexity={model_complexity} unavailable, using the bundled full model: {e}")
+            return solutions_pose(1)
+
+    def _reset_recording(self, capacity=3000):
+        # Columnar sample storage: one preallocated array per field instead of a dict per sample
+        self._rec_i = np.empty(capacity, np.int32)          # frame index
+        self._rec_a = np.empty(capacity, np.uint8)          # angle (0-180 degrees)
+        self._rec_s = np.empty(capacity, np.uint8)          # stage code (_pose_kernel.STAGE_CODES)
+        self._rec_l = np.empty((capacity, 33, 2), np.float16) # landmark x, y
+        self._rec_n = 0
+        self._window_start = 0
+
+    def _grow_recording(self):
+        """Doubles the recording capacity (only for very long sets)."""
+        for name in ("_rec_i", "_rec_a", "_rec_s", "_rec_l"):
+            old = getattr(self, name)
+            new = np.empty((2 * len(old),) + old.shape[1:], old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _recorded_columns(self, start, stop):
+        """Recorded samples [start:stop] in the stop_recording() 'frames' format."""
+        return {
+            "i": self._rec_i[start:stop],
+            "a": self._rec_a[start:stop],
+            "s": [_pose_kernel.STAGES[c] for c in self._rec_s[start:stop].tolist()],
+            "l": self._rec_l[start:stop]
+        }
+
     def start_recording(self):
         """Starts recording pose data for later analysis."""
-        self.recording = True
-        self.recorded_data = [] # Reset data
-        self.frame_count = 0
-        print(f"Recording started for {self.current_exercise}")
+        with self.state_lock:
+            self.recording = True
+            self._reset_recording() # Reset data
+            self.frame_count = 0
+            print(f"Recording started for {self.current_exercise}")
 
     def stop_recording(self):
-        """Stops recording and returns the collected data."""
-        self.recording = False
-        print(f"Recording stopped. Collected {len(self.recorded_data)} frames.")
-        return {
-            "exercise_name": self.current_exercise,
-            "frames": self.recorded_data
-        }
+        """
+        Stops recording and returns the collected data.
+        'frames' is columnar: i, a (int arrays), s (stage per sample) and l ((N, 33, 2) float16).
+        """
+        with self.state_lock:
+            self.recording = False
+            print(f"Recording stopped. Collected {self._rec_n} frames.")
+            return {
+                "exercise_name": self.current_exercise,
+                "frames": self._recorded_columns(0, self._rec_n)
+            }
 
     def add_custom_exercise(self, name, check_func=None, config=None):
         """Adds a new exercise to track dynamically."""
-        name = name.lower()
-        if config:
-            # Enforce uppercase landmarks
-            if 'landmarks' in config:
-                config['landmarks'] = [str(l).upper().strip() for l in config['landmarks']]
-            self.good_forms[name] = config
-            print(f"Added custom exercise: {name}")
+        with self.state_lock:
+            name = name.lower()
+            if config:
+                # Enforce uppercase landmarks
+                if 'landmarks' in config:
+                    config['landmarks'] = [str(l).upper().strip() for l in config['landmarks']]
+                    # Resolved to PoseLandmark indices once here, not on every set_exercise/frame
+                    config['landmark_idx'] = self._resolve_landmarks(config)
+                self.good_forms[name] = config
+                if name == self.current_exercise:
+                    self._analyzer = self._compile_exercise(name)
+                print(f"Added custom exercise: {name}")
 
     def set_exercise(self, exercise_name: str):
         """Sets the current exercise to track."""
-        exercise_name = exercise_name.lower()
-        if exercise_name in self.good_forms:
-            self.current_exercise = exercise_name
-            self.counter = 0
-            self.stage = None
-            desc = self.good_forms[exercise_name].get('description', '')
-            self.feedback = f"Selected: {exercise_name.capitalize()}. {desc}"
-            return True
-        return False
-
-    def _analyze_squat(self, landmarks):
-        """Analyzes Squat form and counts reps."""
-        # Get coordinates
-        hip = [landmarks[self.mp_pose.PoseLandmark.LEFT_HIP.value].x, landmarks[self.mp_pose.PoseLandmark.LEFT_HIP.value].y]
-        knee = [landmarks[self.mp_pose.PoseLandmark.LEFT_KNEE.value].x, landmarks[self.mp_pose.PoseLandmark.LEFT_KNEE.value].y]
-        ankle = [landmarks[self.mp_pose.PoseLandmark.LEFT_ANKLE.value].x, landmarks[self.mp_pose.PoseLandmark.LEFT_ANKLE.value].y]
-        shoulder = [landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].x, landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-        
-        # Calculate knee angle
-        angle = calculate_angle(hip, knee, ankle)
-        
-        # Calculate back angle (approximate with shoulder-hip-vertical? using knee for reference might vary)
-        # Using Knee-Hip-Shoulder angle for torso lean
-        hip_angle = calculate_angle(knee, hip, shoulder)
-
-        state = self.stage
-        if angle > self.good_forms["squat"]["thresholds"]["up"]:
-            state = "UP"
-        if angle < self.good_forms["squat"]["thresholds"]["down"] and state == 'UP':
-            state = "DOWN"
-            self.counter += 1
-            
-        # Form Checks
-        feedback = "Good Form"
-        if hip_angle < 70: # Torso leaning too forward
-            feedback = "Keep Chest Up"
-        if state == "DOWN" and angle > 100: # Not deep enough when trying to go down, simplified logic
-             feedback = "Go Lower"
-             
-        return angle, state, feedback, knee, None # Return knee coordinates for text placement
-
-    def _analyze_curl(self, landmarks):
+        with self.state_lock:
+            exercise_name = exercise_name.lower()
+            if exercise_name in self.good_forms:
+                self.current_exercise = exercise_name
+                self._analyzer = self._compile_exercise(exercise_name)
+                self.counter = 0
+                self.stage = None
+                desc = self.good_forms[exercise_name].get('description', '')
+                self.feedback = f"Selected: {exercise_name.capitalize()}. {desc}"
+                return True
+            return False
+
+    def _resolve_landmarks(self, config):
+        """
+        PoseLandmark indices for a custom exercise's landmark names, or None if any is unknown.
+        Stored as config['landmark_idx'].
+        """
+        if 'landmarks' not in config:
+            return None # Built-in exercise
+        try:
+            return tuple(getattr(self.mp_pose.PoseLandmark, str(l).upper().strip()).value for l in config['landmarks'][:3])
+        except AttributeError:
+            return None
+
+    def _analyze_squat(self, pts):
+        """Analyzes Squat form and counts reps (compiled kernel, see _pose_kernel.squat_kernel)."""
+        thresholds = self.good_forms["squat"]["thresholds"]
+        angle, stage, self.counter, fb = _pose_kernel.squat_kernel(
+            pts, _pose_kernel.STAGE_CODES.get(self.stage, 0), self.counter,
+            float(thresholds["up"]), float(thresholds["down"]))
+        knee = (float(pts[self.L_KNEE, 0]), float(pts[self.L_KNEE, 1]))
+        return angle, _pose_kernel.STAGES[stage], _pose_kernel.SQUAT_FEEDBACK[fb], knee, None # Return knee coordinates for text placement
+
+    def _analyze_curl(self, pts):
         """Analyzes Bicep Curl form and counts reps."""
-        shoulder = [landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].x, landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-        elbow = [landmarks[self.mp_pose.PoseLandmark.LEFT_ELBOW.value].x, landmarks[self.mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-        wrist = [landmarks[self.mp_pose.PoseLandmark.LEFT_WRIST.value].x, landmarks[self.mp_pose.PoseLandmark.LEFT_WRIST.value].y]
+        elbow = pts[self.L_ELBOW]
         
-        angle = calculate_angle(shoulder, elbow, wrist)
+        angle = float(self.joint_angles[_pose_kernel.JOINTS["LEFT_ELBOW"]])
         
-        state = self.stage
+        # One transition per frame, on self.stage
         if angle > self.good_forms["curl"]["thresholds"]["down"]:
-            state = "DOWN"
-        if angle < self.good_forms["curl"]["thresholds"]["up"] and state == 'DOWN':
-            state = "UP"
+            self.stage = "DOWN"
+        elif angle < self.good_forms["curl"]["thresholds"]["up"] and self.stage == 'DOWN':
+            self.stage = "UP"
             self.counter += 1
             
         # Form Checks
         feedback = "Good Form"
         # Check if elbow is moving too much? (Requires previous frames, skipping for simplicity)
         # Check for full ROM
-        if state == "UP" and angle > 45: 
+        if self.stage == "UP" and angle > 45: 
             feedback = "Squeeze at top"
-        if state == "DOWN" and angle < 140:
+        if self.stage == "DOWN" and angle < 140:
             feedback = "Full Extension"
 
-        return angle, state, feedback, elbow, None
+        return angle, self.stage, feedback, elbow, None
 
-    def _analyze_pushup(self, landmarks):
+    def _analyze_pushup(self, pts):
         """Analyzes Pushup form and counts reps."""
-        shoulder = [landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].x, landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-        elbow = [landmarks[self.mp_pose.PoseLandmark.LEFT_ELBOW.value].x, landmarks[self.mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-        wrist = [landmarks[self.mp_pose.PoseLandmark.LEFT_WRIST.value].x, landmarks[self.mp_pose.PoseLandmark.LEFT_WRIST.value].y]
-        hip = [landmarks[self.mp_pose.PoseLandmark.LEFT_HIP.value].x, landmarks[self.mp_pose.PoseLandmark.LEFT_HIP.value].y]
-        ankle = [landmarks[self.mp_pose.PoseLandmark.LEFT_ANKLE.value].x, landmarks[self.mp_pose.PoseLandmark.LEFT_ANKLE.value].y]
+        elbow = pts[self.L_ELBOW]
         
-        elbow_angle = calculate_angle(shoulder, elbow, wrist)
-        body_angle = calculate_angle(shoulder, hip, ankle)
+        elbow_angle = float(self.joint_angles[_pose_kernel.JOINTS["LEFT_ELBOW"]])
+        body_angle = _pose_kernel.angle_at(pts, self.L_SHOULDER, self.L_HIP, self.L_ANKLE)
         
-        state = self.stage
+        # One transition per frame, on self.stage
         if elbow_angle > self.good_forms["pushup"]["thresholds"]["up"]:
-            state = "UP"
-        if elbow_angle < self.good_forms["pushup"]["thresholds"]["down"] and state == 'UP':
-            state = "DOWN"
+            self.stage = "UP"
+        elif elbow_angle < self.good_forms["pushup"]["thresholds"]["down"] and self.stage == 'UP':
+            self.stage = "DOWN"
             self.counter += 1
             
         # Form Checks
@@ -157,149 +356,407 @@ class MotionTracker:
         if body_angle < 160 or body_angle > 200: # Simple plank check
             feedback = "Straighten Body"
             
-        return elbow_angle, state, feedback, elbow, None
+        return elbow_angle, self.stage, feedback, elbow, None
     
 
-    def _analyze_dynamic(self, landmarks):
-        """AI'dan gelen kurallara göre her türlü hareketi analiz eder."""
+    def _compile_exercise(self, name):
+        """
+        Builds the per-frame analyzer for an exercise, once per set_exercise/add_custom_exercise.
+        Returns a callable pts -> (angle, stage, feedback, coord_norm, points), pts being
+        the frame's (33, 2) landmark array.
+        Custom exercises get a closure with their landmark indices, thresholds and
+        rep-counting mode already resolved, so nothing is looked up per frame.
+        """
+        builtin = {"squat": self._analyze_squat, "curl": self._analyze_curl, "pushup": self._analyze_pushup}
+        if name in builtin:
+            return builtin[name]
+
+        config = self.good_forms[name]
+        if 'landmark_idx' not in config: # Config added without add_custom_exercise
+            config['landmark_idx'] = self._resolve_landmarks(config)
+        idx = config['landmark_idx']
+        if idx is None:
+            # Unknown landmark key (e.g. a name MediaPipe doesn't define)
+            bad = f"Bad Landmarks: {str(config.get('landmarks', ['?'])[0]).upper()}..."
+            return lambda pts: (0, self.stage, bad, [0.5,0.5], None)
+
+        # AI'nın belirlediği eklemler (Örn: Lunge için diz, Pushup için dirsek)
+        p1_idx, p2_idx, p3_idx = idx
+        # AI'dan gelen eşiklere göre tekrar say
+        thresholds = config.get('thresholds', {})
         try:
-            config = self.good_forms[self.current_exercise]
-            
-            # AI'nın belirlediği eklemleri seç (Örn: Lunge için diz, Pushup için dirsek)
-            lm_names = [str(l).upper().strip() for l in config['landmarks']]
-            
+            up_thresh = float(thresholds.get('up', 160))
+            down_thresh = float(thresholds.get('down', 90))
+        except (TypeError, ValueError):
+            # Non-numeric threshold (e.g. text from the AI): nothing to count against
+            return lambda pts: (0, self.stage, "Bad Thresholds", [0.5,0.5], None)
+        mode = config.get('mode', 'max_min')
+
+        def points(pts):
+            p1, p2, p3 = pts[p1_idx], pts[p2_idx], pts[p3_idx]
+            return _pose_kernel.angle_at(pts, p1_idx, p2_idx, p3_idx), p1, p2, p3
+
+        # CASE 1: Start High, Go Low (Squat, Pushup, Curl - if measuring inner angle)
+        def analyze_max_min(pts):
+            angle, p1, p2, p3 = points(pts)
+            if angle > up_thresh:
+                self.stage = "UP"
+                self.feedback = "Descend"
+            elif angle < down_thresh and self.stage == "UP":
+                self.stage = "DOWN"
+                self.counter += 1
+                self.feedback = "Push Up!"
+
+            if self.stage is None and angle <= up_thresh:
+                self.feedback = "Fully Extend to Start"
+            return angle, self.stage, self.feedback, p2, [p1, p2, p3]
+
+        # CASE 2: Start Low, Go High (Lateral Raise, Jumping Jack)
+        def analyze_min_max(pts):
+            angle, p1, p2, p3 = points(pts)
+            if angle < down_thresh:
+                self.stage = "DOWN"
+                self.feedback = "Lift High"
+            elif angle > up_thresh and self.stage == "DOWN":
+                self.stage = "UP"
+                self.counter += 1
+                self.feedback = "Return to Start"
+
+            if self.stage is None and angle >= down_thresh:
+                 self.feedback = "Lower Arms to Start"
+            return angle, self.stage, self.feedback, p2, [p1, p2, p3]
+
+        # Unknown mode: only the angle is shown
+        def analyze_angle_only(pts):
+            angle, p1, p2, p3 = points(pts)
+            return angle, self.stage, self.feedback, p2, [p1, p2, p3]
+
+        return {"max_min": analyze_max_min, "min_max": analyze_min_max}.get(mode, analyze_angle_only)
+
+    def _detect(self, frame):
+        """
+        Returns (landmarks, pts): the pose as an (N, 4) x, y, z, visibility array and
+        its contiguous (33, 2) x, y part (both None without a pose), extracted once
+        per frame for the analyzers, recording and drawing.
+        Runs pose inference, except on every other frame of the live view while the
+        body moves slowly: there the pose is extrapolated from the last two detections.
+        Between those, only every detect_every-th frame is inferred, and a frame that
+        barely differs from the last inferred one (e.g. holding a position) reuses
+        the last detection too. With async_inference the live view never waits for
+        the graph (see _detect_async).
+        Fast movements and recording (ground-truth data) always get full inference.
+        """
+        idx = self._frame_idx
+        self._frame_idx += 1
+        self._since_detect += 1
+        small = None
+        if self.recording:
+            pass
+        elif self._skip_next:
+            self._skip_next = False
+            prev, last = self._prev_landmarks, self._last_landmarks
+            guess = last.copy()
+            guess[:, :3] += 0.5 * (last[:, :3] - prev[:, :3]) # Half a step further along x, y, z
+            return guess, np.ascontiguousarray(guess[:, :2])
+        elif self._last_results is not None:
+            if idx % self.detect_every:
+                return self._last_landmarks, self._last_pts
+            small = cv2.cvtColor(cv2.resize(frame, (32, 32), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            if self._prev_small is not None and self._since_detect < self.revalidate_every:
+                diff = np.abs(small.astype(np.int16) - self._prev_small).mean()
+                if diff < self.reuse_threshold:
+                    return self._last_landmarks, self._last_pts
+
+        if self.async_inference and not self.recording:
+            return self._detect_async(frame, idx, small)
+
+        rgb = self._infer_input(frame)
+        rgb.flags.writeable = False
+        with self.pose_lock:
+            results = self.pose.process(rgb)
+        rgb.flags.writeable = True # Reused for the next frame
+        self._prev_small = small
+        return self._store_detection(results)
+
+    def _infer_input(self, frame, reuse=True):
+        """
+        The frame as the pose graph gets it: downscaled to inference_size and in RGB.
+        Written into the reused buffers, unless reuse=False (the caller keeps the array).
+        """
+        # Downscale (before the color conversion, so fewer pixels are converted)
+        src = frame
+        h, w = frame.shape[:2]
+        if self.inference_size and min(h, w) > self.inference_size:
+            scale = self.inference_size / min(h, w)
+            shape = (round(h * scale), round(w * scale), frame.shape[2])
+            if self._resize_buf is None or self._resize_buf.shape != shape:
+                self._resize_buf = np.empty(shape, frame.dtype)
+            src = cv2.resize(frame, shape[1::-1], dst=self._resize_buf, interpolation=cv2.INTER_AREA)
+        if not reuse:
+            return cv2.cvtColor(src, cv2.COLOR_BGR2RGB)
+
+        # Recolor image to RGB into the reused buffer
+        if self._rgb_buf is None or self._rgb_buf.shape != src.shape:
+            self._rgb_buf = np.empty_like(src)
+        return cv2.cvtColor(src, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+
+    def _store_detection(self, results):
+        """Makes fresh pose results the last detection; returns (landmarks, pts) like _detect."""
+        self._inferred += 1
+        self._since_detect = 0
+        self._last_results = results
+        if results is None or results.pose_landmarks is None: # None: failed async inference
+            self._prev_landmarks = self._last_landmarks = self._last_pts = None
+            self._skip_next = False
+            return None, None
+        lms = results.pose_landmarks.landmark
+        self._prev_landmarks = self._last_landmarks
+        self._last_landmarks = np.fromiter((c for lm in lms for c in (lm.x, lm.y, lm.z, lm.visibility)),
+                                           dtype=np.float64, count=4 * len(lms)).reshape(-1, 4)
+        if self.interpolate and self._prev_landmarks is not None and self._prev_landmarks.shape == self._last_landmarks.shape:
+            motion = np.abs(self._last_landmarks[:, :2] - self._prev_landmarks[:, :2]).sum()
+            self._skip_next = motion < self.motion_threshold
+        self._last_pts = np.ascontiguousarray(self._last_landmarks[:, :2])
+        return self._last_landmarks, self._last_pts
+
+    def _detect_async(self, frame, idx, small):
+        """
+        _detect with inference on a worker thread: frame idx replaces any frame still
+        waiting for the worker, and the newest finished result (or the last one) is returned.
+        A failed inference comes back as None and counts as a frame without a pose.
+        """
+        if self._infer_thread is None:
+            self._infer_thread = threading.Thread(target=self._infer_loop, daemon=True)
+            self._infer_thread.start()
+        # Drop-oldest: a frame the worker hasn't started on yet is replaced by this one
+        try:
+            self._infer_in_q.get_nowait()
+        except queue.Empty:
+            pass
+        self._infer_in_q.put((idx, self._infer_input(frame, reuse=False)))
+        self._prev_small = small
+
+        try:
+            done_idx, results = self._infer_out_q.get_nowait()
+        except queue.Empty:
+            return self._last_landmarks, self._last_pts
+        if idx - done_idx > self.max_result_lag:
+            return self._last_landmarks, self._last_pts
+        return self._store_detection(results)
+
+    def _infer_loop(self):
+        """Worker thread for async_inference: runs the pose graph on submitted frames."""
+        failing = False
+        while True:
+            idx, rgb = self._infer_in_q.get()
+            if rgb is None: # close()
+                return
+            rgb.flags.writeable = False
             try:
-                p1_idx = getattr(self.mp_pose.PoseLandmark, lm_names[0]).value
-                p2_idx = getattr(self.mp_pose.PoseLandmark, lm_names[1]).value
-                p3_idx = getattr(self.mp_pose.PoseLandmark, lm_names[2]).value
-            except AttributeError:
-                # Fallback specifically for "Left_..." vs "LEFT_..." mismatches if simple upper() didn't work
-                # or if key is totally wrong
-                 return 0, self.stage, f"Bad Landmarks: {lm_names[0]}...", [0.5,0.5], None
-
-            p1 = landmarks[p1_idx]
-            p2 = landmarks[p2_idx]
-            p3 = landmarks[p3_idx]
-
-            angle = calculate_angle([p1.x, p1.y], [p2.x, p2.y], [p3.x, p3.y])
-
-            # AI'dan gelen eşiklere göre tekrar say
-            up_thresh = config['thresholds'].get('up', 160)
-            down_thresh = config['thresholds'].get('down', 90)
-            mode = config.get('mode', 'max_min')
-
-            # CASE 1: Start High, Go Low (Squat, Pushup, Curl - if measuring inner angle)
-            if mode == 'max_min':
-                if angle > up_thresh:
-                    self.stage = "UP"
-                    self.feedback = "Descend"
-                if angle < down_thresh and self.stage == "UP":
-                    self.stage = "DOWN"
-                    self.counter += 1
-                    self.feedback = "Push Up!"
-
-                if self.stage is None and angle <= up_thresh:
-                    self.feedback = "Fully Extend to Start"
-                    
-            # CASE 2: Start Low, Go High (Lateral Raise, Jumping Jack)
-            elif mode == 'min_max':
-                if angle < down_thresh:
-                    self.stage = "DOWN"
-                    self.feedback = "Lift High"
-                if angle > up_thresh and self.stage == "DOWN":
-                    self.stage = "UP"
-                    self.counter += 1
-                    self.feedback = "Return to Start"
-                
-                if self.stage is None and angle >= down_thresh:
-                     self.feedback = "Lower Arms to Start"
-                
-            return angle, self.stage, self.feedback, [p2.x, p2.y], [p1, p2, p3]
-        except Exception as e:
-            # Fallback for configuration errors
-            print(f"Dynamic Analysis Error: {e}")
-            return 0, self.stage, f"Error: {str(e)[:10]}", [0.5, 0.5], None
+                with self.pose_lock:
+                    results = self.pose.process(rgb)
+                failing = False
+            except Exception as e:
+                if not failing: # Once per run of failures, not on every frame
+                    print(f"Async pose inference failed: {e}")
+                failing = True
+                results = None
+            # Replace any result process_frame has not picked up yet
+            try:
+                self._infer_out_q.get_nowait()
+            except queue.Empty:
+                pass
+            self._infer_out_q.put((idx, results))
+
+    def close(self):
+        """
+        Stops the async_inference worker, if one was started, and returns a pooled
+        pose graph to the pool (don't use the tracker afterwards). The graph is left
+        open for the next tracker; a dedicated one passed to __init__ belongs to the caller.
+        """
+        if self._infer_thread is not None:
+            try:
+                self._infer_in_q.get_nowait() # Drop a frame still waiting for the worker
+            except queue.Empty:
+                pass
+            self._infer_in_q.put((None, None))
+            self._infer_thread.join(timeout=1.0)
+            self._infer_thread = None
+        if self._release_pose is not None:
+            self._release_pose()
+
+    def _draw_pose(self, image, landmarks):
+        """
+        Draws the skeleton like mp_drawing.draw_landmarks with its default style
+        (landmarks under 0.5 visibility or outside the frame are left out), but
+        all bones go out in a single cv2.polylines call.
+        """
+        h, w = image.shape[:2]
+        xy = landmarks[:, :2]
+        ok = (landmarks[:, 3] >= 0.5) & (xy >= 0).all(1) & (xy <= 1).all(1)
+        px = np.minimum(xy * (w, h), (w - 1, h - 1)).astype(np.int32)
+        edges = self._edges[ok[self._edges].all(1)]
+        if len(edges):
+            cv2.polylines(image, px[edges], False, (224, 224, 224), 2)
+        for p in px[ok].tolist():
+            p = tuple(p)
+            cv2.circle(image, p, 3, (224, 224, 224), 2)
+            cv2.circle(image, p, 2, (0, 0, 255), 2)
+
+    @property
+    def skip_ratio(self):
+        """Fraction of frames so far that reused or extrapolated a detection instead of running inference."""
+        return 1 - self._inferred / self._frame_idx if self._frame_idx else 0.0
 
     def process_frame(self, frame):
         """
         Processes a video frame to detect pose and analyze motion.
+        The overlays are drawn in place: the returned image is `frame` itself
+        (or a copy, if `frame` is read-only).
         """
-        # Recolor image to RGB
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image.flags.writeable = False
-      
-        # Make detection
-        results = self.pose.process(image)
+        with self.state_lock:
+            return self._process_frame(frame)
+
+    def _process_frame(self, frame):
+        # Make detection (or predict the pose between two cheap live-view frames)
+        landmarks, pts = self._detect(frame)
     
-        # Recolor back to BGR
-        image.flags.writeable = True
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        # Overlays are drawn straight onto the caller's BGR frame (no RGB->BGR copy back)
+        image = frame if frame.flags.writeable else frame.copy()
+        h, w = image.shape[:2]
         
         angle = 0
-        text_coord = (50, 50) # Default
         
-        try:
-            landmarks = results.pose_landmarks.landmark
-            
-            # Route logic based on selected exercise
-            if self.current_exercise == "squat":
-                angle, self.stage, self.feedback, coord_norm, _ = self._analyze_squat(landmarks)
-            elif self.current_exercise == "curl":
-                angle, self.stage, self.feedback, coord_norm, _ = self._analyze_curl(landmarks)
-            elif self.current_exercise == "pushup":
-                angle, self.stage, self.feedback, coord_norm, _ = self._analyze_pushup(landmarks)
-            else:
-                 # Dynamic fallback
-                 angle, self.stage, self.feedback, coord_norm, _ = self._analyze_dynamic(landmarks)
+        # No pose in view: analysis and the angle label are skipped, the HUD still shows
+        if pts is not None:
+            # Analyzer for the selected exercise (built by _compile_exercise)
+            self.joint_angles = _pose_kernel.joint_angles(pts)
+            angle, self.stage, self.feedback, coord_norm, _ = self._analyzer(pts)
 
             # --- DATA RECORDING ---
             if self.recording:
                 self.frame_count += 1
                 if self.frame_count % 10 == 0:  # Optimization: Sample every 10th frame to reduce data size
-                    # Only save coordinates - round heavily to save space
-                    # We only need x, y for analysis mostly. z is often extrapolated.
-                    pose_coords = [{"x": round(lm.x, 3), "y": round(lm.y, 3)} for lm in landmarks]
-                    
-                    self.recorded_data.append({
-                        "i": self.frame_count,       # Short key
-                        "a": int(angle),             # Short key, integer
-                        "s": self.stage,             # Short key
-                        "l": pose_coords             # Short key
-                    })
-
-            text_coord = tuple(np.multiply(coord_norm, [640, 480]).astype(int))
+                    # Only save coordinates - x, y for analysis mostly. z is often extrapolated.
+                    # Written straight into the columnar arrays (float16 is plenty for 3 decimals)
+                    n = self._rec_n
+                    if n == len(self._rec_i):
+                        self._grow_recording()
+                    self._rec_i[n] = self.frame_count
+                    self._rec_a[n] = min(max(int(angle), 0), 255)
+                    self._rec_s[n] = _pose_kernel.STAGE_CODES.get(self.stage, 0)
+                    self._rec_l[n] = pts
+                    self._rec_n = n + 1
+
+                    # One request per full window instead of one per frame
+                    if self._rec_n - self._window_start == self.window_size:
+                        if self.window_callback:
+                            self.window_callback({"exercise_name": self.current_exercise,
+                                                  "frames": self._recorded_columns(self._window_start, self._rec_n)})
+                        self._window_start = self._rec_n
+
+            text_coord = (int(coord_norm[0] * w), int(coord_norm[1] * h))
             
             # Visualize angle
             cv2.putText(image, str(int(angle)), 
                            text_coord, 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2, cv2.LINE_AA
                                 )
-            
-        except Exception as e:
-            pass
-        
-        # Draw Status Box (Optional UI enhancement)
-        cv2.rectangle(image, (0,0), (225,73), (245,117,16), -1)
-        
-        # Rep Data
-        cv2.putText(image, 'REPS', (15,12), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,0), 1, cv2.LINE_AA)
-        cv2.putText(image, str(self.counter), (10,60), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 2, (255,255,255), 2, cv2.LINE_AA)
         
-        # Stage Data
-        cv2.putText(image, 'STAGE', (65,12), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,0,0), 1, cv2.LINE_AA)
-        cv2.putText(image, str(self.stage), (60,60), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 2, (255,255,255), 2, cv2.LINE_AA)
+        # Status box and feedback bar: pre-rendered tiles pasted in. Text is only
+        # rasterized again when the reps/stage or the feedback line actually change.
+        hud_key = (self.counter, self.stage)
+        if self._hud_key != hud_key:
+            self._hud = self._hud_base.copy()
+            cv2.putText(self._hud, str(self.counter), (10,60), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 2, (255,255,255), 2, cv2.LINE_AA)
+            cv2.putText(self._hud, str(self.stage), (60,60), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 2, (255,255,255), 2, cv2.LINE_AA)
+            self._hud_key = hud_key
+        # Clipped at the frame edge, like drawing the box directly would be
+        hud_h, hud_w = min(self._hud.shape[0], h), min(self._hud.shape[1], w)
+        image[:hud_h, :hud_w] = self._hud[:hud_h, :hud_w]
 
-        # Feedback Data (New)
-        cv2.rectangle(image, (0, 440), (640, 480), (245, 117, 16), -1) 
-        cv2.putText(image, f"Mode: {self.current_exercise.upper()} | {self.feedback}", (10,465), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,255,255), 2, cv2.LINE_AA)
+        # The bar spans the bottom 40 rows of whatever frame size the camera delivers
+        bar_text = f"Mode: {self.current_exercise.upper()} | {self.feedback}"
+        if self._bar_text != (bar_text, w):
+            self._bar = np.empty((40, w, 3), np.uint8)
+            self._bar[:] = HUD_COLOR
+            cv2.putText(self._bar, bar_text, (10,25), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,255,255), 2, cv2.LINE_AA)
+            self._bar_text = (bar_text, w)
+        bar_h = min(40, h)
+        np.copyto(image[h - bar_h:h], self._bar[:bar_h])
         
         # Render detections
-        self.mp_drawing.draw_landmarks(image, results.pose_landmarks, self.mp_pose.POSE_CONNECTIONS)
+        if landmarks is not None:
+            self._draw_pose(image, landmarks)
         
         return image, {"angle": angle, "state": self.stage, "reps": self.counter, "feedback": self.feedback}
-    
\ No newline at end of file
+    
+    def process_stream(self, cap, callback, prefetch=4):
+        """
+        Runs a whole capture (e.g. cv2.VideoCapture on a file) through a 3-stage pipeline:
+        reader thread (cap.read) -> this thread (process_frame) -> writer thread (callback).
+        While frame N is inferred, N+1 is decoded and N-1 is displayed/written, so the
+        wall time is set by the slowest stage instead of the sum of all three.
+        callback(image, data) runs on the writer thread (cv2.imshow, VideoWriter.write, ...);
+        returning False stops the stream. Returns the number of processed frames.
+        """
+        read_q = queue.Queue(maxsize=prefetch)
+        write_q = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        errors = []
+
+        def reader():
+            while not stop.is_set():
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                read_q.put(frame)
+            read_q.put(None) # End of stream
+
+        def writer():
+            while True:
+                item = write_q.get()
+                if item is None:
+                    break
+                if stop.is_set():
+                    continue # Keep draining so the processing thread never blocks
+                try:
+                    if callback(*item) is False:
+                        stop.set()
+                except Exception as e:
+                    errors.append(e)
+                    stop.set()
+
+        threads = [threading.Thread(target=reader, daemon=True), threading.Thread(target=writer, daemon=True)]
+        for t in threads:
+            t.start()
+
+        # Pose inference stays on the calling thread (the graph is stateful)
+        count = 0
+        reader_done = False
+        try:
+            while True:
+                frame = read_q.get()
+                if frame is None:
+                    reader_done = True
+                    break
+                if stop.is_set():
+                    continue # Drain until the reader sees the stop flag
+                write_q.put(self.process_frame(frame))
+                count += 1
+        finally:
+            # Also on an error in process_frame: unblock the reader (it may be stuck on a
+            # full queue) and wait for its end-of-stream marker, then release the writer
+            stop.set()
+            while not reader_done:
+                reader_done = read_q.get() is None
+            write_q.put(None)
+            for t in threads:
+                t.join()
+
+        if errors:
+            raise errors[0]
+        return count
@@ -0,0 +1,177 @@
+import os
+import time
+from types import SimpleNamespace
+import cv2
+import numpy as np
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+try:
+    import mediapipe as mp
+    from mediapipe.framework.formats import landmark_pb2
+except ImportError:
+    mp = None
+    landmark_pb2 = None
+
+# Alternative pose estimators for MotionTracker.
+# Each backend exposes process(rgb) -> object with a `pose_landmarks` attribute
+# (a NormalizedLandmarkList in MediaPipe's 33-landmark layout, or None),
+# so the tracker's analysis and drawing code works unchanged.
+
+DEFAULT_ONNX_MODEL = os.path.join(os.path.dirname(__file__), 'models', 'movenet_lightning.onnx')
+
+def tasks_model_path(model_complexity=0):
+    """PoseLandmarker model file for a Solutions-style model_complexity (0 lite, 1 full, 2 heavy)."""
+    variant = ("lite", "full", "heavy")[model_complexity]
+    return os.path.join(os.path.dirname(__file__), 'models', f'pose_landmarker_{variant}.task')
+
+DEFAULT_TASKS_MODEL = tasks_model_path(0)
+
+# MoveNet keypoint (COCO-17 order) -> MediaPipe PoseLandmark index
+MOVENET_TO_MEDIAPIPE = {
+    0: 0,    # nose
+    1: 2,    # left eye
+    2: 5,    # right eye
+    3: 7,    # left ear
+    4: 8,    # right ear
+    5: 11,   # left shoulder
+    6: 12,   # right shoulder
+    7: 13,   # left elbow
+    8: 14,   # right elbow
+    9: 15,   # left wrist
+    10: 16,  # right wrist
+    11: 23,  # left hip
+    12: 24,  # right hip
+    13: 25,  # left knee
+    14: 26,  # right knee
+    15: 27,  # left ankle
+    16: 28,  # right ankle
+}
+NUM_MEDIAPIPE_LANDMARKS = 33
+
+_PREFERRED_PROVIDERS = ("CUDAExecutionProvider", "OpenVINOExecutionProvider", "CPUExecutionProvider")
+
+
+class OnnxPose:
+    """
+    MoveNet single-pose model (e.g. Lightning, 192x192) running on ONNX Runtime.
+    Uses CUDA or OpenVINO when the installed onnxruntime build provides them
+    (pip install onnxruntime-gpu / onnxruntime-openvino), otherwise CPU.
+    FP16 and INT8 (see quantize_model) exports are supported as-is.
+    """
+
+    def __init__(self, model_path=DEFAULT_ONNX_MODEL, providers=None, input_size=192, min_score=0.3):
+        if ort is None:
+            raise ImportError("onnxruntime not installed")
+        if landmark_pb2 is None:
+            raise ImportError("MediaPipe not installed")
+
+        if providers is None:
+            available = ort.get_available_providers()
+            providers = [p for p in _PREFERRED_PROVIDERS if p in available]
+        self.session = ort.InferenceSession(model_path, providers=providers)
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        if "int32" in model_input.type:
+            self.input_dtype = np.int32 # TF Hub export takes raw 0-255 pixels
+        elif "float16" in model_input.type:
+            self.input_dtype = np.float16
+        else:
+            self.input_dtype = np.float32
+        self.input_size = input_size
+        self.min_score = min_score
+
+    def process(self, rgb):
+        # MoveNet normalizes pixels internally; coordinates come back normalized to
+        # the resized image, which is the same as normalized to the original frame
+        small = cv2.resize(rgb, (self.input_size, self.input_size), interpolation=cv2.INTER_LINEAR)
+        tensor = small[np.newaxis].astype(self.input_dtype)
+        keypoints = self.session.run(None, {self.input_name: tensor})[0].reshape(17, 3) # y, x, score
+
+        if keypoints[:, 2].max() < self.min_score:
+            return SimpleNamespace(pose_landmarks=None)
+
+        landmarks = landmark_pb2.NormalizedLandmarkList()
+        for _ in range(NUM_MEDIAPIPE_LANDMARKS):
+            # Landmarks MoveNet doesn't predict stay invisible (skipped when drawing)
+            landmarks.landmark.add(visibility=0.0)
+        for src, dst in MOVENET_TO_MEDIAPIPE.items():
+            y, x, score = keypoints[src]
+            lm = landmarks.landmark[dst]
+            lm.x, lm.y, lm.visibility = float(x), float(y), float(score)
+        return SimpleNamespace(pose_landmarks=landmarks)
+
+    def reset(self):
+        """No-op: every frame is inferred on its own, there is no tracking state to drop."""
+
+
+class TasksPose:
+    """
+    MediaPipe Tasks PoseLandmarker (e.g. pose_landmarker_lite.task) in VIDEO mode.
+    Tries the GPU delegate (OpenGL/Metal) first and falls back to CPU when the
+    GPU graph can't be created. Results are converted to the Solutions layout.
+    """
+
+    def __init__(self, model_path=DEFAULT_TASKS_MODEL, use_gpu=True,
+                 min_detection_confidence=0.5, min_tracking_confidence=0.5):
+        if mp is None:
+            raise ImportError("MediaPipe not installed")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Pose model not found: {model_path}")
+
+        vision = mp.tasks.vision
+        delegates = [mp.tasks.BaseOptions.Delegate.GPU] if use_gpu else []
+        delegates.append(mp.tasks.BaseOptions.Delegate.CPU)
+        error = None
+        for delegate in delegates:
+            options = vision.PoseLandmarkerOptions(
+                base_options=mp.tasks.BaseOptions(model_asset_path=model_path, delegate=delegate),
+                running_mode=vision.RunningMode.VIDEO,
+                min_pose_detection_confidence=min_detection_confidence,
+                min_tracking_confidence=min_tracking_confidence
+            )
+            try:
+                self.landmarker = vision.PoseLandmarker.create_from_options(options)
+                self.delegate = delegate
+                self._options = options
+                break
+            except Exception as e: # No GPU / GL context on this machine
+                error = e
+        else:
+            raise RuntimeError(f"Could not create PoseLandmarker: {error}")
+        self.last_ts = -1
+
+    def process(self, rgb):
+        # VIDEO mode needs strictly increasing timestamps
+        ts = max(int(time.monotonic() * 1000), self.last_ts + 1)
+        self.last_ts = ts
+        image = mp.Image(image_format=mp.ImageFormat.SRGB, data=np.ascontiguousarray(rgb))
+        result = self.landmarker.detect_for_video(image, ts)
+        if not result.pose_landmarks:
+            return SimpleNamespace(pose_landmarks=None)
+
+        landmarks = landmark_pb2.NormalizedLandmarkList()
+        for lm in result.pose_landmarks[0]:
+            landmarks.landmark.add(x=lm.x, y=lm.y, z=lm.z, visibility=lm.visibility or 0.0)
+        return SimpleNamespace(pose_landmarks=landmarks)
+
+    def reset(self):
+        """
+        Drops the tracking/smoothing state, so the next frame starts a new stream.
+        PoseLandmarker has no reset, so this recreates it from its options, which
+        reloads the model (from the local .task file) and costs about as much as a new one.
+        """
+        self.landmarker.close()
+        self.landmarker = mp.tasks.vision.PoseLandmarker.create_from_options(self._options)
+
+    def close(self):
+        self.landmarker.close()
+
+
+def quantize_model(src_path, dst_path):
+    """Writes a dynamically INT8-quantized copy of an ONNX model (faster on CPU-only hosts)."""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(src_path, dst_path, weight_type=QuantType.QUInt8)
+    return dst_path
@@ -1,4 +1,4 @@
-import numpy as np
+import math
 import cv2
 
 def calculate_angle(a: list, b: list, c: list) -> float:
@@ -6,12 +6,9 @@ def calculate_angle(a: list, b: list, c: list) -> float:
     Calculates the angle between three points (a, b, c).
     b is the vertex.
     """
-    a = np.array(a) # First
-    b = np.array(b) # Mid
-    c = np.array(c) # End
-    
-    radians = np.arctan2(c[1]-b[1], c[0]-b[0]) - np.arctan2(a[1]-b[1], a[0]-b[0])
-    angle = np.abs(radians*180.0/np.pi)
+    # Plain float math: the inputs are 3 points, so building ndarrays costs more than the math
+    radians = math.atan2(c[1]-b[1], c[0]-b[0]) - math.atan2(a[1]-b[1], a[0]-b[0])
+    angle = abs(radians*180.0/math.pi)
     
     if angle > 180.0:
         angle = 360-angle
@@ -0,0 +1,35 @@
+import threading
+import av
+from streamlit_webrtc import VideoProcessorBase
+from .camera import paste_rec_indicator
+
+
+class PoseVideoProcessor(VideoProcessorBase):
+    """
+    streamlit-webrtc video processor.
+    Frames arrive from the browser on streamlit-webrtc's worker thread, so capture
+    and pose inference never block the Streamlit script (or get torn down by reruns).
+    """
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.record = False
+        self.latest_data = None
+        self.lock = threading.Lock()
+
+    def recv(self, frame):
+        image = frame.to_ndarray(format="bgr24")
+        image, data = self.tracker.process_frame(image)
+
+        # Recording Status Indicator
+        if self.record:
+            paste_rec_indicator(image)
+
+        with self.lock:
+            self.latest_data = data
+        return av.VideoFrame.from_ndarray(image, format="bgr24")
+
+    def get_latest_data(self):
+        """Returns the tracker output for the most recent frame (or None)."""
+        with self.lock:
+            return self.latest_data